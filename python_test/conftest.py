@@ -1,3 +1,5 @@
+import json
+import logging
 import os
 import sys
 from pathlib import Path
@@ -6,38 +8,114 @@ project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 from typing import Any, Generator
 
-import grpc
-from grpc import insecure_channel
-from selenium.webdriver.chrome.options import Options
-
-from internal.grpc.interceptors.allure import AllureInterceptor
-from internal.grpc.interceptors.logging import LoggingInterceptor
-from internal.pb.niffler_currency_pb2_pbreflect import NifflerCurrencyServiceClient
+from internal.grpc.channels import AsyncChannelPool, ChannelPool, channel_options
+from internal.grpc.currency import AsyncCurrencyClient, CurrencyClient
+from internal.grpc.interceptors.allure import AllureInterceptor, AsyncAllureInterceptor
+from internal.grpc.interceptors.logging import AsyncLoggingInterceptor, LoggingInterceptor
+from internal.grpc.interceptors.timing import AsyncTimingInterceptor, TimingInterceptor
 
 import pytest
+import pytest_asyncio
 from allure_commons.reporter import AllureReporter
+from allure_commons.types import AttachmentType
 from allure_pytest.listener import AllureListener
 from dotenv import load_dotenv
 from pytest import FixtureDef, FixtureRequest
-from selenium import webdriver
 from selenium.webdriver.chrome.webdriver import WebDriver
 
-from python_test.data_helper.api_helper import UserApiHelper, SpendsHttpClient
+from python_test.data_helper.api_helper import AsyncSpendsHttpClient, UserApiHelper, SpendsHttpClient
 from python_test.data_helper.kafka_client import KafkaClient
+from python_test.data_helper.token_cache import CachedToken
+from python_test.databases.engines import engines
+from python_test.databases.instrumentation import sql_stats
 from python_test.databases.spend_db import SpendDb
 from python_test.model.config import Envs
 from python_test.model.db.category import Category
 from python_test.model.db.spend import SpendAdd
 from python_test.model.niffler import Niffler
+from python_test.utils.attachments import attachments
+from python_test.utils.browser_pool import BrowserPool
+from python_test.utils.soap_builder import envelopes
+from python_test.utils.templates import templates
+from python_test.utils.waiters import wait_stats
 
-pytest_plugins = ["fixtures.auth_fixtures", "fixtures.client_fixtures"]
+pytest_plugins = ["fixtures.auth_fixtures", "fixtures.client_fixtures", "fixtures.user_fixtures", "plugins.durations",
+                  "plugins.scheduler"]
 
 INTERCEPTORS = [
     LoggingInterceptor(),
     AllureInterceptor(),
+    TimingInterceptor(),
+]
+
+ASYNC_INTERCEPTORS = [
+    AsyncLoggingInterceptor(),
+    AsyncAllureInterceptor(),
+    AsyncTimingInterceptor(),
 ]
 
 
+def pytest_addoption(parser):
+    parser.addini('precompile_templates', type='bool', default=False,
+                  help='Скомпилировать jinja шаблоны и SOAP конверты из resources/templates на старте сессии')
+    parser.addini('allure_attachments', default='all',
+                  help='Запись вложений HTTP/SOAP/gRPC/SQL: all, failed - только для упавших тестов, '
+                       'sampled - для упавших и доли успешных')
+    parser.addini('allure_attachments_sample_rate', default='0.1',
+                  help='Доля успешных тестов с вложениями в режиме sampled')
+    parser.addini('allure_attachments_max_kb', default='0',
+                  help='Обрезать вложения больше заданного размера в KB, 0 - без ограничений')
+    parser.addini('sql_attachments', default='each',
+                  help='SQL во вложениях: each - каждый запрос, summary - сводка по тесту, off - без вложений')
+    parser.addini('sql_slowest', default='5', help='Сколько самых долгих запросов теста показывать в сводке')
+    parser.addini('wait_stats_dir', default='',
+                  help='Каталог для json статистики ожиданий по воркерам, пусто - только в лог')
+    parser.addini('browser_pool_size', default='1', help='Сколько браузеров заранее запускать на воркер')
+    parser.addini('browser_pool_max_uses', default='20', help='Перезапускать браузер после заданного числа выдач')
+    parser.addini('ui_api_login', type='bool', default=True,
+                  help='Фикстура niffler авторизуется через API и подкладывает сессию в браузер, без формы логина')
+    parser.addini('token_cache_dir', default='',
+                  help='Каталог общего для воркеров кэша OAuth токенов, по умолчанию во временном каталоге системы')
+    parser.addini('user_pool_file', default='',
+                  help='Файл пула заранее созданных пользователей, по умолчанию во временном каталоге системы')
+    parser.addini('user_pool_refill', default='20', help='Сколько пользователей создавать при пополнении пула')
+    parser.addini('isolate_workers', type='bool', default=True,
+                  help='Отдельный тестовый пользователь на каждый воркер xdist. false - только без -n')
+    parser.addini('db_pool_size', default='5', help='Размер пула соединений к каждой БД на воркер')
+    parser.addini('db_max_overflow', default='10', help='Сколько соединений сверх пула можно открыть на воркер')
+    parser.addini('db_pool_recycle', default='1800', help='Пересоздавать соединения старше заданного числа секунд')
+    parser.addini('grpc_channels', default='1', help='Сколько gRPC каналов (соединений) держать на воркер')
+    parser.addini('grpc_keepalive_ms', default='30000', help='Интервал keepalive пингов gRPC каналов')
+    parser.addini('db_pool_pre_ping', type='bool', default=True, help='Проверять соединение перед выдачей из пула')
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    if config.getoption('numprocesses', None) and not config.getini('isolate_workers'):
+        # без блокировок воркеры под одним пользователем удаляют данные друг друга
+        raise pytest.UsageError('isolate_workers = false несовместим с параллельным запуском (-n)')
+    attachments.configure(config)
+    sql_stats.configure(config)
+    engines.configure(pool_size=int(config.getini('db_pool_size')),
+                      max_overflow=int(config.getini('db_max_overflow')),
+                      pool_recycle=int(config.getini('db_pool_recycle')),
+                      pool_pre_ping=config.getini('db_pool_pre_ping'))
+
+
+def pytest_sessionstart(session):
+    if session.config.getini('precompile_templates'):
+        templates.precompile()
+        envelopes.precompile()
+
+
+def pytest_sessionfinish(session):
+    engines.dispose_all()
+    wait_stats.log_summary()
+    if stats_dir := session.config.getini('wait_stats_dir'):
+        worker = os.environ.get('PYTEST_XDIST_WORKER', 'master')
+        wait_stats.dump(Path(stats_dir) / f'{worker}.json')
+
+
 def allure_logger(config) -> AllureReporter:
     listener: AllureListener = config.pluginmanager.get_plugin("allure_listener")
     return listener.allure_logger
@@ -53,30 +131,34 @@ def pytest_fixture_setup(fixturedef: FixtureDef, request: FixtureRequest):
     item.name = f'[{scope_letter}] {normalize_fix_name}'
 
 
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    attachments.on_report(outcome.get_result())
+
+
 @pytest.hookimpl(hookwrapper=True, tryfirst=True)
 def pytest_runtest_teardown(item):
     yield
     reporter = allure_logger(item.config)
     test = reporter.get_test(None)
     test.labels = list(filter(lambda x: x.name not in ("suite", "subSuite", "parentSuite"), test.labels))
+    pool_metrics = engines.flush_metrics()
+    if pool_metrics:
+        attachments.attach(lambda: json.dumps(pool_metrics, indent=4), name='DB pool metrics per test',
+                           attachment_type=AttachmentType.JSON)
+    sql_stats.flush()
 
 
 @pytest.fixture(scope="session", autouse=True)
-def envs() -> Envs:
+def envs(request: FixtureRequest, worker_id: str) -> Envs:
+    """Настройки стенда. При запуске через xdist каждый воркер работает под своим пользователем
+    TEST_USERNAME_gwN, чтобы тесты разных воркеров не видели и не удаляли данные друг друга."""
     load_dotenv()
-    return Envs(
-        frontend_url=os.getenv("FRONTEND_URL"),
-        gateway_url=os.getenv("GATEWAY_URL"),
-        auth_url=os.getenv('AUTH_URL'),
-        auth_secret=os.getenv("AUTH_SECRET"),
-        spend_db_url=os.getenv("SPEND_DB_URL"),
-        test_username=os.getenv("TEST_USERNAME"),
-        test_password=os.getenv("TEST_PASSWORD"),
-        kafka_address=os.getenv("KAFKA_ADDRESS"),
-        userdata_db_url=os.getenv('USERDATA_DB_URL'),
-        soap_address=os.getenv("SOAP_ADDRESS"),
-        grpc_service_host=os.getenv('GRPC_HOST'),
-    )
+    envs = Envs.from_os_environ()
+    if worker_id != 'master' and request.config.getini('isolate_workers'):
+        envs.test_username = f'{envs.test_username}_{worker_id}'
+    return envs
 
 
 @pytest.fixture(scope='session', autouse=True)
@@ -84,23 +166,36 @@ def app_user(envs: Envs):
     UserApiHelper(envs).create_user(user_name=envs.test_username, user_password=envs.test_password)
 
 
+@pytest.fixture(scope='session')
+def browser_pool(request: FixtureRequest, envs: Envs) -> Generator[BrowserPool, Any, None]:
+    pool = BrowserPool(origins=[envs.frontend_url, envs.auth_url],
+                       size=int(request.config.getini('browser_pool_size')),
+                       max_uses=int(request.config.getini('browser_pool_max_uses')))
+    pool.prewarm()
+    yield pool
+    pool.close()
+    report = pool.report()
+    logging.info(f'Пул браузеров: {report}')
+    attachments.attach(lambda: json.dumps(report, indent=4), name='Browser pool', attachment_type=AttachmentType.JSON)
+
+
 @pytest.fixture(scope='module')
-def web_driver() -> Generator[WebDriver, Any, None]:
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--incognito")
-    options.add_argument("--disable-dev-shm-usage")
-    wd = webdriver.Chrome(options=options)
+def web_driver(browser_pool: BrowserPool) -> Generator[WebDriver, Any, None]:
+    wd = browser_pool.acquire()
     wd.maximize_window()
     yield wd
-    wd.quit()
+    browser_pool.release(wd)
 
 
 @pytest.fixture(scope='module')
-def niffler(web_driver: WebDriver, app_user, envs) -> Generator[Niffler, Any, None]:
+def niffler(request: FixtureRequest, web_driver: WebDriver, app_user, envs) -> Generator[Niffler, Any, None]:
     niffler = Niffler(web_driver)
-    niffler.login_page.go_to_niffler()
-    niffler.login_page.login_by_exist_user(envs.test_username, envs.test_password)
+    if request.config.getini('ui_api_login'):
+        user_token: CachedToken = request.getfixturevalue('user_token')
+        niffler.login_page.login_by_token(user_token.id_token, user_token.cookies)
+    else:
+        niffler.login_page.go_to_niffler()
+        niffler.login_page.login_by_exist_user(envs.test_username, envs.test_password)
     assert niffler.main_page.is_page_load(), 'Главная страница не прогрузилась'
     yield niffler
 
@@ -124,6 +219,15 @@ def spend(request: FixtureRequest, spends_client: SpendsHttpClient) -> Generator
         spends_client.delete_spending_by_id(test_spend.id)
 
 
+@pytest_asyncio.fixture(params=[], loop_scope='session')
+async def spends(request: FixtureRequest, async_spends_client: AsyncSpendsHttpClient) -> list[SpendAdd]:
+    """Пачка трат, созданных параллельно. request.param - список kwargs для add_spend"""
+    test_spends = await async_spends_client.add_spends_bulk(request.param)
+    yield test_spends
+    existing = set(await async_spends_client.get_ids_all_spending())
+    await async_spends_client.delete_spends_bulk([spend.id for spend in test_spends if spend.id in existing])
+
+
 @pytest.fixture(scope="session")
 def kafka(envs):
     """Взаимодействие с Kafka"""
@@ -131,9 +235,29 @@ def kafka(envs):
         yield k
 
 
+def _grpc_pool_settings(config: pytest.Config) -> dict:
+    return {
+        'size': int(config.getini('grpc_channels')),
+        'options': channel_options(keepalive_ms=int(config.getini('grpc_keepalive_ms'))),
+    }
+
+
 @pytest.fixture(scope='session')
-def grpc_client(envs: Envs, request: pytest.FixtureRequest) -> NifflerCurrencyServiceClient:
-    host = envs.grpc_service_host
-    channel = insecure_channel(host)
-    intercepted_channel = grpc.intercept_channel(channel, *INTERCEPTORS)
-    return NifflerCurrencyServiceClient(intercepted_channel)
+def grpc_client(envs: Envs, request: pytest.FixtureRequest) -> Generator[CurrencyClient, Any, None]:
+    with ChannelPool(envs.grpc_service_host, interceptors=INTERCEPTORS,
+                     **_grpc_pool_settings(request.config)) as pool:
+        yield CurrencyClient(pool)
+
+
+@pytest_asyncio.fixture(scope='session', loop_scope='session')
+async def async_grpc_perf_client(envs: Envs, request: pytest.FixtureRequest) -> AsyncCurrencyClient:
+    """Клиент без интерцепторов для замеров: печать и allure вложения на каждый вызов не входят в задержку"""
+    async with AsyncChannelPool(envs.grpc_service_host, **_grpc_pool_settings(request.config)) as pool:
+        yield AsyncCurrencyClient(pool)
+
+
+@pytest_asyncio.fixture(scope='session', loop_scope='session')
+async def async_grpc_client(envs: Envs, request: pytest.FixtureRequest) -> AsyncCurrencyClient:
+    async with AsyncChannelPool(envs.grpc_service_host, interceptors=ASYNC_INTERCEPTORS,
+                                **_grpc_pool_settings(request.config)) as pool:
+        yield AsyncCurrencyClient(pool)
@@ -1,7 +1,10 @@
+import asyncio
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from http import HTTPStatus
-from typing import Literal
+from typing import Iterable, Literal
 
 import allure
 import requests
@@ -10,7 +13,17 @@ from requests import Session
 from python_test.model.config import Envs
 from python_test.model.db.category import Category
 from python_test.model.db.spend import SpendAdd
-from python_test.utils.sessions import BaseSession
+from python_test.utils.allure_helpers import async_step
+from python_test.utils.sessions import AsyncBaseSession, BaseSession
+from python_test.utils.stats import LatencyReservoir
+
+CURRENCIES = ('RUB', 'KZT', 'USD', 'EUR')
+
+
+def chunked(items: list, size: int) -> Iterable[list]:
+    """Разбить список на части размером не более size"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
 
 class UserApiHelper:
@@ -36,13 +49,49 @@ class UserApiHelper:
         return response
 
 
-class SpendsHttpClient:
-    session: BaseSession
+class _SpendsClientMixin:
+    user_name: str
+    batch_latencies: LatencyReservoir
+
+    def _build_spend(self, category: str,
+                     amount: float,
+                     currency: str = 'RUB',
+                     desc: str = '',
+                     date: datetime | str = None,
+                     spend_id: str = None) -> SpendAdd:
+        if currency not in CURRENCIES:
+            raise ValueError('Не правильный тип валюты')
+        if not date:
+            date = datetime.now(timezone.utc)
+        formatted_time = date.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        category_spend = Category(name=category, username=self.user_name, archived=False)
+        return SpendAdd(
+            id=spend_id,
+            spendDate=formatted_time,
+            category=category_spend,
+            currency=currency,
+            amount=amount,
+            description=desc,
+            username=self.user_name
+        )
+
+    def _report_batch(self, operation: str, number: int, size: int, elapsed: float):
+        self.batch_latencies.add(elapsed)
+        logging.info(f'{operation}: батч {number}, {size} шт. за {elapsed:.3f}s')
+
+
+class SpendsHttpClient(_SpendsClientMixin):
+    session: Session
     base_url: str
+    chunk_size: int
+    batch_latencies: LatencyReservoir
 
-    def __init__(self, envs: Envs, token: str):
-        self.session = BaseSession(base_url=envs.gateway_url)
+    def __init__(self, envs: Envs, token: str, chunk_size: int = 100, session: Session | None = None):
+        """session - сессия вместо BaseSession, например PlainSession без allure вложений для нагрузки"""
+        self.session = session or BaseSession(base_url=envs.gateway_url)
         self.user_name = envs.test_username
+        self.chunk_size = chunk_size
+        self.batch_latencies = LatencyReservoir()
         self.session.headers.update({
             'Accept': 'application/json',
             'Authorization': f'Bearer {token}',
@@ -60,23 +109,25 @@ class SpendsHttpClient:
                   currency: str = 'RUB',
                   desc: str = '',
                   date: datetime | str = None) -> SpendAdd:
-        if currency not in ('RUB', 'KZT', 'EUR', 'USD'):
-            raise ValueError('Не правильный тип валюты')
-        if not date:
-            date = datetime.now(timezone.utc)
-        formatted_time = date.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-        category_spend = Category(name=category, username=self.user_name, archived=False)
-        spend = SpendAdd(
-            spendDate=formatted_time,
-            category=category_spend,
-            currency=currency,
-            amount=amount,
-            description=desc,
-            username=self.user_name
-        )
+        spend = self._build_spend(category, amount, currency, desc, date)
         _resp = self.session.post('/api/spends/add', json=spend.model_dump())
         return SpendAdd.model_validate(_resp.json())
 
+    @allure.step('Добавить траты пачками')
+    def add_spends_bulk(self, spends: Iterable[dict], chunk_size: int = None) -> list[SpendAdd]:
+        """Добавить траты батчами, запросы внутри батча выполняются параллельно.
+        spends - набор kwargs для add_spend."""
+        chunk_size = chunk_size or self.chunk_size
+        models = [self._build_spend(**spend).model_dump() for spend in spends]
+        created = []
+        with ThreadPoolExecutor(max_workers=min(chunk_size, 16)) as executor:
+            for number, chunk in enumerate(chunked(models, chunk_size), start=1):
+                start = time.perf_counter()
+                responses = executor.map(lambda body: self.session.post('/api/spends/add', json=body), chunk)
+                created += [SpendAdd.model_validate(_resp.json()) for _resp in responses]
+                self._report_batch('Добавление трат', number, len(chunk), time.perf_counter() - start)
+        return created
+
     @allure.step('Обновить трату')
     def update_spend(self, spend_id: str,
                      category: str,
@@ -84,32 +135,23 @@ class SpendsHttpClient:
                      currency: str = 'RUB',
                      desc: str = '',
                      date: datetime | str = None) -> SpendAdd:
-        if currency not in ('RUB', 'KZT', 'EUR', 'USD'):
-            raise ValueError('Не правильный тип валюты')
-        if not date:
-            date = datetime.now(timezone.utc)
-        formatted_time = date.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-        category_spend = Category(name=category, username=self.user_name, archived=False)
-        spend = SpendAdd(
-            id=spend_id,
-            spendDate=formatted_time,
-            category=category_spend,
-            currency=currency,
-            amount=amount,
-            description=desc,
-            username=self.user_name
-        )
+        spend = self._build_spend(category, amount, currency, desc, date, spend_id=spend_id)
         _resp = self.session.patch('/api/spends/edit', json=spend.model_dump())
         return SpendAdd.model_validate(_resp.json())
 
+    @allure.step('Получить все траты пользователя')
+    def get_all_spends(self) -> list[dict]:
+        """Получить траты по всем типам валют, запросы по валютам выполняются параллельно"""
+        with ThreadPoolExecutor(max_workers=len(CURRENCIES)) as executor:
+            responses = executor.map(
+                lambda currency: self.session.get('/api/spends/all', params={'filterCurrency': currency}),
+                CURRENCIES
+            )
+            return [spend for _resp in responses for spend in _resp.json()]
+
     @allure.step('Получить id всех трат пользователя')
     def get_ids_all_spending(self) -> list[str]:
-        ids = []
-        for currency in ['RUB', 'KZT', 'USD', 'EUR']:
-            _resp = self.session.get(f'/api/spends/all?filterCurrency={currency}')
-            body = _resp.json()
-            ids += [spend['id'] for spend in body]
-        return ids
+        return [spend['id'] for spend in self.get_all_spends()]
 
     @allure.step('Получить id всех трат пользователя по типу валюты')
     def get_spending_ids_by_currency(self, currency: Literal['RUB', 'KZT', 'USD', 'EUR'] = 'RUB') -> list[str]:
@@ -121,11 +163,20 @@ class SpendsHttpClient:
         _resp = self.session.delete(f'/api/spends/remove?ids={spending_id}')
         return _resp.status_code
 
+    @allure.step('Удалить траты пачками')
+    def delete_spends_bulk(self, spending_ids: list[str], chunk_size: int = None) -> int:
+        """Удалить траты списками ids по chunk_size штук за запрос. Возвращает количество запрошенных к удалению id:
+        gateway отвечает на удаление без тела, поэтому число фактически удаленных неизвестно"""
+        chunk_size = chunk_size or self.chunk_size
+        for number, chunk in enumerate(chunked(spending_ids, chunk_size), start=1):
+            start = time.perf_counter()
+            self.session.delete('/api/spends/remove', params={'ids': ','.join(chunk)})
+            self._report_batch('Удаление трат', number, len(chunk), time.perf_counter() - start)
+        return len(spending_ids)
+
     @allure.step('Удалить все траты пользователя')
     def delete_all_spending(self):
-        spending_ids_lst = self.get_ids_all_spending()
-        for spending_id in spending_ids_lst:
-            self.delete_spending_by_id(spending_id)
+        self.delete_spends_bulk(self.get_ids_all_spending())
 
     @allure.step('Добавить категорию')
     def add_category(self, category_name: str, archived: bool = False) -> Category:
@@ -149,3 +200,138 @@ class SpendsHttpClient:
     def get_ids_all_categories(self, exclude_archived: bool = False) -> list[str]:
         _resp = self.session.get('/api/categories/all', params={'archived': exclude_archived})
         return [cat['id'] for cat in _resp.json()]
+
+
+class AsyncSpendsHttpClient(_SpendsClientMixin):
+    """Асинхронный аналог SpendsHttpClient. Параллельность запросов ограничена concurrency."""
+    session: AsyncBaseSession
+    chunk_size: int
+    batch_latencies: LatencyReservoir
+
+    def __init__(self, envs: Envs, token: str, chunk_size: int = 100, concurrency: int = 10):
+        self.session = AsyncBaseSession(base_url=envs.gateway_url, max_connections=concurrency)
+        self.user_name = envs.test_username
+        self.chunk_size = chunk_size
+        self.batch_latencies = LatencyReservoir()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json'
+        })
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.session.aclose()
+
+    async def gather(self, *coroutines) -> list:
+        """Выполнить корутины параллельно, одновременно не более concurrency"""
+
+        async def _limited(coroutine):
+            async with self.semaphore:
+                return await coroutine
+
+        return await asyncio.gather(*(_limited(coroutine) for coroutine in coroutines))
+
+    @async_step('Получить трату по id')
+    async def get_spend_by_id(self, spend_id: str):
+        _resp = await self.session.get(f'/api/spends/{spend_id}')
+        return SpendAdd.model_validate(_resp.json())
+
+    @async_step('Добавить новую трату')
+    async def add_spend(self, category: str,
+                        amount: float,
+                        currency: str = 'RUB',
+                        desc: str = '',
+                        date: datetime | str = None) -> SpendAdd:
+        spend = self._build_spend(category, amount, currency, desc, date)
+        _resp = await self.session.post('/api/spends/add', json=spend.model_dump())
+        return SpendAdd.model_validate(_resp.json())
+
+    @async_step('Добавить траты пачками')
+    async def add_spends_bulk(self, spends: Iterable[dict], chunk_size: int = None) -> list[SpendAdd]:
+        """Добавить траты батчами, запросы внутри батча выполняются параллельно.
+        spends - набор kwargs для add_spend."""
+        chunk_size = chunk_size or self.chunk_size
+        created = []
+        for number, chunk in enumerate(chunked(list(spends), chunk_size), start=1):
+            start = time.perf_counter()
+            created += await self.gather(*(self.add_spend(**spend) for spend in chunk))
+            self._report_batch('Добавление трат', number, len(chunk), time.perf_counter() - start)
+        return created
+
+    @async_step('Обновить трату')
+    async def update_spend(self, spend_id: str,
+                           category: str,
+                           amount: float,
+                           currency: str = 'RUB',
+                           desc: str = '',
+                           date: datetime | str = None) -> SpendAdd:
+        spend = self._build_spend(category, amount, currency, desc, date, spend_id=spend_id)
+        _resp = await self.session.patch('/api/spends/edit', json=spend.model_dump())
+        return SpendAdd.model_validate(_resp.json())
+
+    @async_step('Получить все траты пользователя')
+    async def get_all_spends(self) -> list[dict]:
+        responses = await self.gather(
+            *(self.session.get('/api/spends/all', params={'filterCurrency': currency}) for currency in CURRENCIES)
+        )
+        return [spend for _resp in responses for spend in _resp.json()]
+
+    @async_step('Получить id всех трат пользователя')
+    async def get_ids_all_spending(self) -> list[str]:
+        return [spend['id'] for spend in await self.get_all_spends()]
+
+    @async_step('Получить id всех трат пользователя по типу валюты')
+    async def get_spending_ids_by_currency(self, currency: Literal['RUB', 'KZT', 'USD', 'EUR'] = 'RUB') -> list[str]:
+        _resp = await self.session.get('/api/spends/all', params={'filterCurrency': currency})
+        return [spend['id'] for spend in _resp.json()]
+
+    @async_step('Удалить трату')
+    async def delete_spending_by_id(self, spending_id: str) -> int:
+        _resp = await self.session.delete('/api/spends/remove', params={'ids': spending_id})
+        return _resp.status_code
+
+    @async_step('Удалить траты пачками')
+    async def delete_spends_bulk(self, spending_ids: list[str], chunk_size: int = None) -> int:
+        """Удалить траты списками ids по chunk_size штук, батчи отправляются параллельно.
+        Возвращает количество запрошенных к удалению id"""
+        chunk_size = chunk_size or self.chunk_size
+
+        async def _delete_chunk(number: int, chunk: list[str]):
+            start = time.perf_counter()
+            await self.session.delete('/api/spends/remove', params={'ids': ','.join(chunk)})
+            self._report_batch('Удаление трат', number, len(chunk), time.perf_counter() - start)
+
+        await self.gather(*(_delete_chunk(number, chunk)
+                            for number, chunk in enumerate(chunked(spending_ids, chunk_size), start=1)))
+        return len(spending_ids)
+
+    @async_step('Удалить все траты пользователя')
+    async def delete_all_spending(self):
+        await self.delete_spends_bulk(await self.get_ids_all_spending())
+
+    @async_step('Добавить категорию')
+    async def add_category(self, category_name: str, archived: bool = False) -> Category:
+        category_dict = {'name': category_name, 'username': self.user_name, 'archived': archived}
+        _resp = await self.session.post('/api/categories/add', json=category_dict)
+        return Category.model_validate(_resp.json())
+
+    @async_step('Получить категорию по id')
+    async def get_category_by_id(self, category_id: str, exclude_archived: bool = False) -> Category:
+        _resp = await self.session.get('/api/categories/all', params={'archived': exclude_archived})
+        category = next((cat for cat in _resp.json() if cat['id'] == category_id), None)
+        return Category.model_validate(category)
+
+    @async_step('Обновить категорию')
+    async def update_category(self, category_id: str, category_name: str, archived: bool = False):
+        category_dict = {"id": category_id, 'name': category_name, 'username': self.user_name, 'archived': archived}
+        _resp = await self.session.patch('/api/categories/update', json=category_dict)
+        return Category.model_validate(_resp.json())
+
+    @async_step('Получить id всех категорий пользователя')
+    async def get_ids_all_categories(self, exclude_archived: bool = False) -> list[str]:
+        _resp = await self.session.get('/api/categories/all', params={'archived': exclude_archived})
+        return [cat['id'] for cat in _resp.json()]
@@ -0,0 +1,242 @@
+"""Граф дружбы заданного размера и распределения степеней, загрузка в niffler-userdata и замер запроса friends.
+
+Из корня репозитория, с .env в каталоге python_test:
+    python -m python_test.data_helper.friendship_graph --users 10000 --mean-degree 8 --load db
+Результаты замеров дописываются в --out (по умолчанию python_test/.friends-benchmark.jsonl)
+и сравниваются с предыдущим прогоном.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Literal
+
+from dotenv import load_dotenv
+
+from python_test.data_helper.user_factory import UserFactory
+from python_test.databases.usertdata_db import UserdataDb
+from python_test.model.config import Envs
+from python_test.resources.templates.read_templates import (accept_invitations_xml, friends_many,
+                                                            send_invitations_xml)
+from python_test.utils.sessions import SoapSession
+from python_test.utils.stats import latency_summary_ms
+from python_test.utils.xml_check import decode_users
+
+# Нижние границы корзин числа друзей для отчета
+DEGREE_BUCKETS = (0, 1, 5, 20, 100, 500)
+
+
+@dataclass
+class FriendshipGraph:
+    """Неориентированный граф дружбы: вершины 0..size-1, ребро (кто пригласил, кого пригласили)"""
+    size: int
+    edges: list[tuple[int, int]]
+
+    def degrees(self) -> list[int]:
+        degrees = [0] * self.size
+        for requester, addressee in self.edges:
+            degrees[requester] += 1
+            degrees[addressee] += 1
+        return degrees
+
+
+def _degrees(size: int, mean_degree: float, distribution: str, exponent: float, max_degree: int,
+             rng: random.Random) -> list[int]:
+    if distribution == 'uniform':
+        return [min(rng.randint(0, round(2 * mean_degree)), max_degree) for _ in range(size)]
+    if distribution == 'power_law':
+        if exponent <= 2:
+            raise ValueError('Для степенного распределения с конечным средним нужен exponent > 2')
+        # Парето с alpha = exponent - 1, минимум подобран так, чтобы среднее было mean_degree
+        alpha = exponent - 1
+        minimum = mean_degree * (alpha - 1) / alpha
+        return [min(max(int(minimum * rng.paretovariate(alpha)), 1), max_degree) for _ in range(size)]
+    raise ValueError(f'Неизвестное распределение: {distribution}')
+
+
+def generate_graph(size: int, mean_degree: float = 8, distribution: Literal['power_law', 'uniform'] = 'power_law',
+                   exponent: float = 2.5, max_degree: int | None = None, seed: int | None = None) -> FriendshipGraph:
+    """Граф по модели конфигурации: степени вершин из распределения, концы ребер соединяются случайно.
+    Петли и повторные ребра отбрасываются, поэтому фактическая средняя степень немного ниже заданной."""
+    rng = random.Random(seed)
+    degrees = _degrees(size, mean_degree, distribution, exponent, max_degree or size - 1, rng)
+    stubs = [node for node, degree in enumerate(degrees) for _ in range(degree)]
+    rng.shuffle(stubs)
+    edges = set()
+    # при нечетной сумме степеней последний конец ребра остается без пары и отбрасывается
+    for requester, addressee in zip(stubs[::2], stubs[1::2], strict=False):
+        if requester != addressee and (addressee, requester) not in edges:
+            edges.add((requester, addressee))
+    return FriendshipGraph(size, sorted(edges))
+
+
+@dataclass
+class LoadedGraph:
+    graph: FriendshipGraph
+    ids: list[str]
+    usernames: list[str]
+
+
+class GraphLoader:
+    """Загрузка графа в niffler-userdata: вставкой в БД или приглашениями через SOAP"""
+
+    def __init__(self, userdata_db: UserdataDb, soap: SoapSession | None = None, factory: UserFactory | None = None):
+        self.userdata_db = userdata_db
+        self.soap = soap
+        self.factory = factory
+
+    def load_db(self, graph: FriendshipGraph, prefix: str | None = None) -> LoadedGraph:
+        """Пользователи и принятые дружбы (по строке на каждое направление, как после acceptInvitation)"""
+        prefix = prefix or f'graph_{uuid.uuid4().hex[:8]}'
+        ids = [str(uuid.uuid4()) for _ in range(graph.size)]
+        usernames = [f'{prefix}_{i}' for i in range(graph.size)]
+        self.userdata_db.insert_users([
+            {'id': user_id, 'username': username, 'currency': 'RUB', 'firstname': '', 'surname': '',
+             'full_name': '', 'photo': None, 'photo_small': None}
+            for user_id, username in zip(ids, usernames, strict=True)
+        ])
+        today = date.today()
+        self.userdata_db.insert_friendships([
+            {'requester_id': ids[a], 'addressee_id': ids[b], 'status': 'ACCEPTED', 'created_date': today}
+            for requester, addressee in graph.edges for a, b in ((requester, addressee), (addressee, requester))
+        ])
+        return LoadedGraph(graph, ids, usernames)
+
+    def load_soap(self, graph: FriendshipGraph, concurrency: int | None = None) -> LoadedGraph:
+        """Пользователи через Kafka, дружбы - sendInvitation и acceptInvitation через SOAP"""
+        if self.soap is None or self.factory is None:
+            raise ValueError('Для загрузки через SOAP нужны SoapSession и UserFactory')
+        users = self.factory.provision(graph.size, via='kafka')
+        usernames = [user.username for user in users]
+        pairs = [(usernames[requester], usernames[addressee]) for requester, addressee in graph.edges]
+        self.soap.send_many(send_invitations_xml(pairs), concurrency)
+        self.soap.send_many(accept_invitations_xml((to, username) for username, to in pairs), concurrency)
+        return LoadedGraph(graph, [user.id for user in users], usernames)
+
+    def unload(self, loaded: LoadedGraph) -> int:
+        return self.userdata_db.delete_users(loaded.ids)
+
+
+def _bucket(degree: int) -> int:
+    return max(bound for bound in DEGREE_BUCKETS if bound <= degree)
+
+
+def friends_benchmark(soap: SoapSession, loaded: LoadedGraph, queries: tuple[str, ...] = ('', '_1'),
+                      samples: int = 5, repeats: int = 3, seed: int | None = None) -> list[dict]:
+    """Задержка friends по корзинам числа друзей и строке поиска.
+    Запросы выполняются последовательно, чтобы конкуренция не искажала задержку одного запроса.
+    Для пустой строки поиска в строке отчета есть wrong_counts: username -> [друзей в графе, вернул friends]
+    по пользователям, которым хотя бы раз вернулось не столько друзей, сколько у них в графе."""
+    rng = random.Random(seed)
+    degrees = loaded.graph.degrees()
+    by_bucket: dict[int, list[int]] = {}
+    for node, degree in enumerate(degrees):
+        by_bucket.setdefault(_bucket(degree), []).append(node)
+    rows = []
+    for bucket, nodes in sorted(by_bucket.items()):
+        sample = rng.sample(nodes, min(samples, len(nodes)))
+        for query in queries:
+            nodes = [node for node in sample for _ in range(repeats)]
+            responses = soap.send_many(friends_many([loaded.usernames[node] for node in nodes], query), concurrency=1)
+            returned = [len(decode_users(response.content).users) for response in responses]
+            row = {
+                'bucket': bucket,
+                'query': query,
+                'users': len(sample),
+                'friends_avg': round(sum(degrees[node] for node in sample) / len(sample), 1),
+                'returned_avg': round(sum(returned) / len(returned), 1),
+                **latency_summary_ms([response.elapsed.total_seconds() for response in responses]),
+            }
+            if not query:
+                row['wrong_counts'] = {loaded.usernames[node]: [degrees[node], count]
+                                       for node, count in zip(nodes, returned, strict=True) if count != degrees[node]}
+            rows.append(row)
+    return rows
+
+
+class BenchmarkHistory:
+    """История замеров friends в jsonl, одна строка на прогон"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def last(self) -> dict | None:
+        if not self.path.exists():
+            return None
+        lines = self.path.read_text(encoding='utf8').splitlines()
+        return json.loads(lines[-1]) if lines else None
+
+    def append(self, params: dict, rows: list[dict]) -> dict:
+        run = {'started': time.time(), 'params': params, 'rows': rows}
+        with self.path.open('a', encoding='utf8') as file:
+            file.write(json.dumps(run) + '\n')
+        return run
+
+
+def compare(previous: list[dict], current: list[dict]) -> list[dict]:
+    """p50 и p95 текущего прогона относительно предыдущего по совпадающим корзинам и строкам поиска"""
+    before = {(row['bucket'], row['query']): row for row in previous}
+    result = []
+    for row in current:
+        old = before.get((row['bucket'], row['query']))
+        if old and old['p50_ms'] and old['p95_ms']:
+            result.append({'bucket': row['bucket'], 'query': row['query'],
+                           'p50_ratio': round(row['p50_ms'] / old['p50_ms'], 2),
+                           'p95_ratio': round(row['p95_ms'] / old['p95_ms'], 2)})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Граф дружбы в niffler-userdata и замер запроса friends')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--mean-degree', type=float, default=8)
+    parser.add_argument('--distribution', choices=('power_law', 'uniform'), default='power_law')
+    parser.add_argument('--exponent', type=float, default=2.5, help='Показатель степенного распределения, > 2')
+    parser.add_argument('--max-degree', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--load', choices=('db', 'soap'), default='db', help='Загрузка вставкой в БД или через SOAP')
+    parser.add_argument('--concurrency', type=int, default=20, help='Параллельность SOAP запросов при загрузке')
+    parser.add_argument('--queries', nargs='*', default=['', '_1'], help='Строки поиска friends')
+    parser.add_argument('--samples', type=int, default=5, help='Пользователей на корзину числа друзей')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--out', default=str(Path(__file__).parent.parent / '.friends-benchmark.jsonl'),
+                        help='Файл истории замеров')
+    parser.add_argument('--keep', action='store_true', help='Не удалять граф после замера')
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent.parent / '.env')
+    envs = Envs.from_os_environ()
+    userdata_db = UserdataDb(envs)
+    soap = SoapSession(base_url=envs.soap_address, pool_size=args.concurrency)
+    loader = GraphLoader(userdata_db, soap, UserFactory(envs, userdata_db) if args.load == 'soap' else None)
+
+    graph = generate_graph(args.users, args.mean_degree, args.distribution, args.exponent, args.max_degree, args.seed)
+    print(f'Граф: {graph.size} пользователей, {len(graph.edges)} дружб, максимум друзей {max(graph.degrees())}')
+    started = time.perf_counter()
+    loaded = loader.load_db(graph) if args.load == 'db' else loader.load_soap(graph, args.concurrency)
+    print(f'Загружен через {args.load} за {time.perf_counter() - started:.1f}s')
+    try:
+        rows = friends_benchmark(soap, loaded, tuple(args.queries), args.samples, args.repeats, args.seed)
+    finally:
+        if not args.keep:
+            loader.unload(loaded)
+
+    history = BenchmarkHistory(Path(args.out))
+    previous = history.last()
+    history.append({key: value for key, value in vars(args).items() if key not in ('out', 'keep')}, rows)
+    for row in rows:
+        print(f"  friends>={row['bucket']:<4} query={row['query']!r:<6} friends_avg={row['friends_avg']:<7} "
+              f"returned_avg={row['returned_avg']:<7} p50={row['p50_ms']}ms p95={row['p95_ms']}ms")
+    if previous:
+        print('Относительно предыдущего прогона:')
+        for row in compare(previous['rows'], rows):
+            print(f"  friends>={row['bucket']:<4} query={row['query']!r:<6} "
+                  f"p50 x{row['p50_ratio']} p95 x{row['p95_ratio']}")
+
+
+if __name__ == '__main__':
+    main()
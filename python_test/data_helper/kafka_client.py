@@ -1,13 +1,138 @@
 import json
 import logging
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import takewhile
+from typing import Callable, Iterable
 
-from confluent_kafka import TopicPartition
+from confluent_kafka import ConsumerGroupTopicPartitions, TopicPartition
 from confluent_kafka.admin import AdminClient
 from confluent_kafka.cimpl import Consumer, Producer
 
 from python_test.model.db.user import UserName
+from python_test.model.kafka import ProduceStats
+from python_test.utils.stats import latency_summary_ms
 from python_test.utils.waiters import wait_until_timeout
 
+USER_HEADERS = {"__TypeId__": "guru.qa.niffler.model.UserJson"}
+
+
+def user_payload(username: str) -> bytes:
+    return json.dumps(UserName(username=username).model_dump()).encode("utf-8")
+
+
+class KafkaRecord:
+    """Сообщение из топика, json тела декодируется один раз при первом обращении"""
+
+    def __init__(self, seq: int, message):
+        self.seq = seq
+        self.topic = message.topic()
+        self.partition = message.partition()
+        self.offset = message.offset()
+        self.key = message.key().decode('utf8') if message.key() else None
+        self.value: bytes = message.value()
+        self.timestamp = message.timestamp()[1]
+        self._json = None
+
+    @property
+    def json(self):
+        if self._json is None:
+            self._json = json.loads(self.value.decode('utf8'))
+        return self._json
+
+
+class TopicListener(threading.Thread):
+    """Фоновое чтение топика в кольцевой буфер с индексом по ключу сообщения или полю json.
+    Ожидающие потоки будятся через condition variable, сообщения из буфера не удаляются при чтении,
+    поэтому один слушатель разделяют все тесты воркера."""
+
+    def __init__(self, consumer_config: dict, topic: str, index_field: str | None = None, capacity: int = 10_000):
+        super().__init__(name=f'kafka-listener-{topic}', daemon=True)
+        self.topic = topic
+        self.index_field = index_field
+        self.capacity = capacity
+        self.consumer = Consumer({**consumer_config, "group.id": f"qa-listener-{uuid.uuid4()}"})
+        self.buffer: deque[KafkaRecord] = deque()
+        self.index: dict[str, list[KafkaRecord]] = {}
+        self.condition = threading.Condition()
+        self._seq = 0
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Назначить партиции с текущего конца топика и запустить чтение.
+        Назначение синхронное, поэтому сообщения, отправленные после start, не теряются."""
+        partitions = self.consumer.list_topics(self.topic, timeout=10).topics[self.topic].partitions
+        topic_partitions = []
+        for p_id in partitions:
+            _, high = self.consumer.get_watermark_offsets(TopicPartition(self.topic, p_id), timeout=10)
+            topic_partitions.append(TopicPartition(self.topic, p_id, high))
+        self.consumer.assign(topic_partitions)
+        super().start()
+
+    def run(self):
+        while not self._stopped.is_set():
+            message = self.consumer.poll(0.5)
+            if message is None:
+                continue
+            if message.error():
+                logging.error(f'{self.topic}: {message.error()}')
+                continue
+            self._append(message)
+
+    def stop(self):
+        self._stopped.set()
+        self.join(timeout=5)
+        self.consumer.close()
+
+    def _index_value(self, record: KafkaRecord) -> str | None:
+        if self.index_field is None:
+            return record.key
+        try:
+            return str(record.json.get(self.index_field))
+        except (ValueError, AttributeError):
+            return None
+
+    def _append(self, message):
+        with self.condition:
+            self._seq += 1
+            record = KafkaRecord(self._seq, message)
+            if len(self.buffer) >= self.capacity:
+                evicted = self.buffer.popleft()
+                evicted_key = self._index_value(evicted)
+                if evicted_key in self.index:
+                    self.index[evicted_key].remove(evicted)
+                    if not self.index[evicted_key]:
+                        del self.index[evicted_key]
+            self.buffer.append(record)
+            key = self._index_value(record)
+            if key is not None:
+                self.index.setdefault(key, []).append(record)
+            self.condition.notify_all()
+
+    def await_message(self, predicate: Callable[[KafkaRecord], bool] | None = None, value: str | None = None,
+                      timeout: float = 25) -> KafkaRecord:
+        """Дождаться сообщения по значению индекса и/или предикату.
+        По value поиск идет по индексу, предикат проверяется только на новых сообщениях с момента прошлой проверки."""
+        deadline = time.monotonic() + timeout
+        last_seq = 0
+        with self.condition:
+            while True:
+                if value is not None:
+                    candidates = self.index.get(value, [])
+                else:
+                    candidates = reversed(list(takewhile(lambda r, seen=last_seq: r.seq > seen, reversed(self.buffer))))
+                for record in candidates:
+                    if predicate is None or predicate(record):
+                        return record
+                if value is None and self.buffer:
+                    last_seq = self.buffer[-1].seq
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f'Сообщение в топике {self.topic} не получено за {timeout}s')
+                self.condition.wait(remaining)
+
 
 class KafkaClient:
     """Класс для взаимодействия с кафкой"""
@@ -16,24 +141,41 @@ class KafkaClient:
         self.server = envs.kafka_address
         self.admin = AdminClient({"bootstrap.servers": f"{self.server}:9092"})
         self.producer = Producer({"bootstrap.servers": f"{self.server}:9092", })
-        self.consumer = Consumer(
-            {
-                "bootstrap.servers": f"{self.server}:9093",
-                "group.id": group_id,
-                "client.id": client_id,
-                "auto.offset.reset": "latest",
-                "enable.auto.commit": False,
-                "enable.ssl.certificate.verification": False
-            }
-        )
+        self.consumer_config = {
+            "bootstrap.servers": f"{self.server}:9093",
+            "group.id": group_id,
+            "client.id": client_id,
+            "auto.offset.reset": "latest",
+            "enable.auto.commit": False,
+            "enable.ssl.certificate.verification": False
+        }
+        self.consumer = Consumer(self.consumer_config)
+        self.listeners: dict[str, TopicListener] = {}
+        self._listeners_lock = threading.Lock()
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        for listener in self.listeners.values():
+            listener.stop()
         self.consumer.close()
         self.producer.flush()
 
+    def listen(self, topic: str, index_field: str | None = None, capacity: int = 10_000) -> TopicListener:
+        """Запустить фоновое чтение топика, повторный вызов возвращает уже запущенного слушателя"""
+        with self._listeners_lock:
+            if topic not in self.listeners:
+                listener = TopicListener(self.consumer_config, topic, index_field, capacity)
+                listener.start()
+                self.listeners[topic] = listener
+            return self.listeners[topic]
+
+    def await_message(self, topic: str, predicate: Callable[[KafkaRecord], bool] | None = None,
+                      value: str | None = None, timeout: float = 25) -> KafkaRecord:
+        """Дождаться сообщения в топике, слушатель должен быть запущен через listen"""
+        return self.listeners[topic].await_message(predicate, value, timeout)
+
     def list_topics_names(self, attempts: int = 10):
         """Вернуть список доступных топиков"""
         try:
@@ -62,6 +204,18 @@ class KafkaClient:
         except Exception as err:
             logging.error("probably no such topic: %s: %s", topic, err)
 
+    def get_consumer_lag(self, group_id: str, topic: str) -> int:
+        """Суммарное по партициям отставание группы консьюмеров от конца топика"""
+        partitions = self.consumer.list_topics(topic, timeout=10).topics[topic].partitions
+        request = ConsumerGroupTopicPartitions(group_id, [TopicPartition(topic, p_id) for p_id in partitions])
+        result = self.admin.list_consumer_group_offsets([request])[group_id].result()
+        lag = 0
+        for partition in result.topic_partitions:
+            _, high = self.consumer.get_watermark_offsets(TopicPartition(topic, partition.partition), timeout=10)
+            committed = max(partition.offset, 0)
+            lag += max(high - committed, 0)
+        return lag
+
     def log_msg_and_json(self, topic_partitions):
         msg = self.consume_message(topic_partitions, timeout=25)
         logging.info(msg)
@@ -83,8 +237,59 @@ class KafkaClient:
 
     def send_message(self, topic: str, username: str):
         self.producer.produce(topic,
-                              json.dumps(UserName(username=username).model_dump()).encode("utf-8"),
+                              user_payload(username),
                               on_delivery=self.delivery_report,
-                              headers={"__TypeId__": "guru.qa.niffler.model.UserJson"},
+                              headers=USER_HEADERS,
                               )
         self.producer.flush()
+
+    def send_messages(self, topic: str, usernames: Iterable[str], linger_ms: int = 50,
+                      batch_size: int = 1_000_000, compression: str = 'lz4') -> ProduceStats:
+        """Отправить сообщения UserName без flush на каждое сообщение.
+        Отчеты о доставке собираются асинхронно, flush выполняется один раз в конце."""
+        producer = Producer({
+            "bootstrap.servers": f"{self.server}:9092",
+            "linger.ms": linger_ms,
+            "batch.size": batch_size,
+            "compression.type": compression,
+            "queue.buffering.max.messages": 1_000_000,
+        })
+        latencies = []
+        failed = []
+
+        def on_delivery(err, msg):
+            if err is not None:
+                failed.append(err)
+            else:
+                latencies.append(msg.latency())
+
+        sent = bytes_sent = 0
+        started = time.perf_counter()
+        for username in usernames:
+            payload = user_payload(username)
+            while True:
+                try:
+                    producer.produce(topic, payload, on_delivery=on_delivery, headers=USER_HEADERS)
+                    break
+                except BufferError:
+                    producer.poll(0.1)
+            producer.poll(0)
+            sent += 1
+            bytes_sent += len(payload)
+        producer.flush()
+        elapsed = time.perf_counter() - started
+
+        if failed:
+            logging.error(f"Ошибок при отправке: {len(failed)}, первая: {failed[0]}")
+        stats = ProduceStats(
+            sent=sent,
+            delivered=len(latencies),
+            failed=len(failed),
+            bytes_sent=bytes_sent,
+            elapsed_s=round(elapsed, 3),
+            msgs_per_s=round(sent / elapsed, 2) if elapsed else 0.0,
+            bytes_per_s=round(bytes_sent / elapsed, 2) if elapsed else 0.0,
+            **latency_summary_ms([latency for latency in latencies if latency is not None]),
+        )
+        logging.info(f'{topic}: {stats.model_dump()}')
+        return stats
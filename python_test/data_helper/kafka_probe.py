@@ -0,0 +1,70 @@
+import logging
+import time
+import uuid
+
+import allure
+
+from python_test.data_helper.kafka_client import KafkaClient
+from python_test.databases.usertdata_db import UserdataDb
+from python_test.model.kafka import IngestionReport
+from python_test.utils.stats import latency_summary_ms
+
+
+class UserdataIngestionProbe:
+    """Замер пути users topic -> niffler-userdata -> БД userdata.
+    Отправляет N сообщений, следит за lag группы консьюмеров userdata и пачками ищет пользователей в БД.
+    Время доставки считается от отправки сообщения до обнаружения записи, точность - poll_interval."""
+
+    def __init__(self, kafka: KafkaClient, userdata_db: UserdataDb, topic: str = 'users', group_id: str = 'userdata'):
+        self.kafka = kafka
+        self.userdata_db = userdata_db
+        self.topic = topic
+        self.group_id = group_id
+
+    @allure.step('Замерить доставку {count} сообщений в БД userdata')
+    def run(self, count: int, timeout: float = 120, poll_interval: float = 0.5) -> IngestionReport:
+        prefix = f'probe_{uuid.uuid4().hex[:8]}'
+        sent_at: dict[str, float] = {}
+
+        def _usernames():
+            for i in range(count):
+                username = f'{prefix}_{i}'
+                sent_at[username] = time.monotonic()
+                yield username
+
+        produce_stats = self.kafka.send_messages(self.topic, _usernames())
+
+        arrived_at: dict[str, float] = {}
+        waiting = list(sent_at)
+        lag_samples = []
+        deadline = time.monotonic() + timeout
+        while waiting and time.monotonic() < deadline:
+            lag_samples.append(self.kafka.get_consumer_lag(self.group_id, self.topic))
+            found = self.userdata_db.get_existing_usernames(waiting)
+            now = time.monotonic()
+            for username in found:
+                arrived_at[username] = now
+            waiting = [username for username in waiting if username not in found]
+            if waiting:
+                time.sleep(poll_interval)
+
+        latencies = [arrived_at[username] - sent_at[username] for username in arrived_at]
+        if arrived_at:
+            window = max(arrived_at.values()) - min(sent_at.values())
+            ingestion_rate = round(len(arrived_at) / window, 2) if window else 0.0
+        else:
+            ingestion_rate = 0.0
+        report = IngestionReport(
+            messages=count,
+            arrived=len(arrived_at),
+            missing=len(waiting),
+            produce=produce_stats,
+            ingestion_rate=ingestion_rate,
+            max_consumer_lag=max(lag_samples, default=0),
+            lag_samples=lag_samples,
+            **latency_summary_ms(latencies),
+        )
+        logging.info(f'Доставка в userdata: {report.model_dump(exclude={"lag_samples"})}')
+        allure.attach(report.model_dump_json(indent=2), name='Ingestion report',
+                      attachment_type=allure.attachment_type.JSON)
+        return report
@@ -29,6 +29,7 @@ class OAuthClient:
         self._basic_token = base64.b64encode(env.auth_secret.encode('utf-8')).decode('utf-8')
         self.authorization_basic = {"Authorization": f"Basic {self._basic_token}"}
         self.token = None
+        self.id_token = None
 
     def get_token(self, username: str, password: str) -> str:
         """Возвращает token oauth для авторизации пользователя с username и password
@@ -67,4 +68,5 @@ class OAuthClient:
         )
 
         self.token = token_response.json().get("access_token", None)
+        self.id_token = token_response.json().get("id_token", None)
         return self.token
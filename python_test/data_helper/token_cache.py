@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from pathlib import Path
+
+import requests
+from filelock import FileLock
+from pydantic import BaseModel
+
+from python_test.data_helper.oauth_client import OAuthClient
+from python_test.model.config import Envs
+
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / 'niffler-tokens'
+
+
+class CachedToken(BaseModel):
+    username: str
+    access_token: str
+    id_token: str | None = None
+    cookies: dict[str, str] = {}
+    expires_at: float
+
+    def is_fresh(self, margin: float) -> bool:
+        return time.time() + margin < self.expires_at
+
+
+def _jwt_part(token: str, index: int) -> dict:
+    part = token.split('.')[index]
+    part += '=' * (-len(part) % 4)
+    return json.loads(base64.urlsafe_b64decode(part))
+
+
+def jwt_exp(token: str) -> float | None:
+    """Время истечения jwt из поля exp, без проверки подписи"""
+    try:
+        return float(_jwt_part(token, 1)['exp'])
+    except (IndexError, ValueError, KeyError):
+        return None
+
+
+def jwt_kid(token: str) -> str | None:
+    """Идентификатор ключа подписи из заголовка jwt"""
+    try:
+        return _jwt_part(token, 0).get('kid')
+    except (IndexError, ValueError):
+        return None
+
+
+class TokenCache:
+    """Кэш токенов по (auth_url, username), общий для всех воркеров.
+
+    Каждый токен хранится в отдельном файле каталога cache_dir под своим FileLock,
+    поэтому воркеры не ждут друг друга на разных пользователях, а один пользователь авторизуется один раз.
+    Токен перевыпускается заранее, за refresh_margin секунд до exp из jwt, а также если он подписан ключом,
+    которого нет в jwks стенда: после перезапуска niffler-auth ключи другие и старые токены получат 401.
+    В файлах лежат токены и cookies сессии, поэтому каталог доступен только владельцу (0o700, файлы 0o600).
+    """
+
+    def __init__(self, envs: Envs, cache_dir: Path = DEFAULT_CACHE_DIR, refresh_margin: float = 60,
+                 default_ttl: float = 300):
+        self.envs = envs
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.cache_dir.chmod(0o700)
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self._memory: dict[str, CachedToken] = {}
+        self._memory_lock = threading.Lock()
+
+    def _path(self, username: str) -> Path:
+        key = hashlib.sha1(f'{self.envs.auth_url}|{username}'.encode('utf8')).hexdigest()
+        return self.cache_dir / f'{key}.json'
+
+    def get(self, username: str, password: str) -> CachedToken:
+        with self._memory_lock:
+            token = self._memory.get(username)
+        if token and token.is_fresh(self.refresh_margin):
+            return token
+        path = self._path(username)
+        with FileLock(path.with_suffix('.lock')):
+            token = self._read(path)
+            if token is None or not self._is_valid(token):
+                token = self._issue(username, password)
+                self._write(path, token)
+        with self._memory_lock:
+            self._memory[username] = token
+        return token
+
+    def get_many(self, credentials: list[tuple[str, str]], workers: int = 16) -> dict[str, CachedToken]:
+        """Получить токены для многих пользователей параллельно"""
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            tokens = list(executor.map(lambda c: self.get(*c), credentials))
+        return {token.username: token for token in tokens}
+
+    def invalidate(self, username: str):
+        with self._memory_lock:
+            self._memory.pop(username, None)
+        path = self._path(username)
+        with FileLock(path.with_suffix('.lock')):
+            path.unlink(missing_ok=True)
+
+    @cached_property
+    def signing_keys(self) -> set[str] | None:
+        """kid ключей подписи стенда из /oauth2/jwks, запрашиваются один раз. None - jwks недоступен"""
+        try:
+            response = requests.get(f'{self.envs.auth_url}/oauth2/jwks', timeout=5)
+            response.raise_for_status()
+            return {key['kid'] for key in response.json()['keys'] if 'kid' in key}
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logging.warning(f'Не удалось получить jwks стенда, токены из кэша проверяются только по exp: {e}')
+            return None
+
+    def _is_valid(self, token: CachedToken) -> bool:
+        if not token.is_fresh(self.refresh_margin):
+            return False
+        kid = jwt_kid(token.access_token)
+        return kid is None or self.signing_keys is None or kid in self.signing_keys
+
+    @staticmethod
+    def _write(path: Path, token: CachedToken):
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(descriptor, 0o600)
+        with open(descriptor, 'w', encoding='utf8') as file:
+            file.write(token.model_dump_json())
+
+    @staticmethod
+    def _read(path: Path) -> CachedToken | None:
+        if not path.exists():
+            return None
+        try:
+            return CachedToken.model_validate_json(path.read_text(encoding='utf8'))
+        except ValueError:
+            logging.warning(f'Поврежденный файл кэша токена {path}, токен будет перевыпущен')
+            return None
+
+    def _issue(self, username: str, password: str) -> CachedToken:
+        client = OAuthClient(self.envs)
+        access_token = client.get_token(username, password)
+        expirations = [exp for exp in (jwt_exp(access_token), jwt_exp(client.id_token or '')) if exp]
+        return CachedToken(
+            username=username,
+            access_token=access_token,
+            id_token=client.id_token,
+            cookies=client.session.cookies.get_dict(),
+            expires_at=min(expirations) if expirations else time.time() + self.default_ttl,
+        )
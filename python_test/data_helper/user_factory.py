@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from typing import Literal
+
+import allure
+from faker import Faker
+from filelock import FileLock
+
+from python_test.data_helper.api_helper import UserApiHelper
+from python_test.data_helper.kafka_client import KafkaClient
+from python_test.databases.usertdata_db import UserdataDb
+from python_test.model.config import Envs
+from python_test.model.users import ProvisionedUser
+from python_test.utils.waiters import exponential, wait_for
+
+fake = Faker()
+
+
+def unique_username() -> str:
+    return f'{fake.user_name()}_{uuid.uuid4().hex[:8]}'
+
+
+class UserFactory:
+    """Параллельное создание пользователей через регистрацию в niffler-auth или сообщениями в топик users.
+    Через Kafka пользователь появляется только в userdata, без учетной записи для логина."""
+
+    def __init__(self, envs: Envs, userdata_db: UserdataDb, kafka: KafkaClient | None = None, workers: int = 16):
+        self.envs = envs
+        self.userdata_db = userdata_db
+        self.kafka = kafka
+        self.workers = workers
+        self._local = threading.local()
+
+    def _register(self, username: str, password: str) -> int | None:
+        """Код ответа, если регистрация отклонена, иначе None"""
+        if not hasattr(self._local, 'helper'):
+            self._local.helper = UserApiHelper(self.envs)
+        response = self._local.helper.create_user(username, password)
+        return None if response.status_code == HTTPStatus.CREATED else response.status_code
+
+    @allure.step('Создать {count} пользователей')
+    def provision(self, count: int, via: Literal['api', 'kafka'] = 'api', timeout: float = 60) -> list[ProvisionedUser]:
+        usernames = [unique_username() for _ in range(count)]
+        passwords = {}
+        if via == 'kafka':
+            if self.kafka is None:
+                raise ValueError('Для создания пользователей через Kafka нужен KafkaClient')
+            self.kafka.send_messages('users', usernames)
+        else:
+            passwords = {username: fake.password(length=10, special_chars=False) for username in usernames}
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                statuses = list(executor.map(self._register, usernames, passwords.values()))
+            # отклоненный пользователь не появится в userdata, ждать его до timeout бессмысленно
+            rejected = {username: status for username, status in zip(usernames, statuses, strict=True) if status}
+            if rejected:
+                raise RuntimeError(f'niffler-auth отклонил регистрацию {len(rejected)} из {count} пользователей: '
+                                   f'{rejected}')
+        users = wait_for(self.userdata_db.get_users, usernames, timeout=timeout, backoff=exponential(0.2),
+                         condition=lambda found: len(found) == count, raise_on_timeout=True,
+                         name='пользователей в userdata')
+        return [ProvisionedUser(username=user.username, password=passwords.get(user.username), id=str(user.id))
+                for user in users]
+
+
+class UserPool:
+    """Сохраненный на диске запас созданных пользователей, общий для воркеров и прогонов.
+
+    lease выдает пользователей, которые еще не использовались, и убирает их из пула,
+    поэтому тесты получают пользователей без друзей и измененных данных.
+    Если пула не хватает, он пополняется пачкой refill_size через UserFactory.
+    """
+
+    def __init__(self, factory: UserFactory, path: Path | None = None, refill_size: int = 20,
+                 via: Literal['api', 'kafka'] = 'api'):
+        self.factory = factory
+        self.via = via
+        self.refill_size = refill_size
+        if path is None:
+            key = hashlib.sha1(f'{factory.envs.auth_url}|{via}'.encode('utf8')).hexdigest()[:12]
+            path = Path(tempfile.gettempdir()) / f'niffler-users-{key}.json'
+        self.path = Path(path)
+        # в файле пароли пользователей, поэтому файл и блокировка доступны только владельцу
+        self._lock = FileLock(self.path.with_suffix('.lock'), mode=0o600)
+
+    def _load(self) -> list[ProvisionedUser]:
+        if not self.path.exists():
+            return []
+        try:
+            return [ProvisionedUser.model_validate(user) for user in json.loads(self.path.read_text(encoding='utf8'))]
+        except ValueError:
+            logging.warning(f'Поврежденный файл пула пользователей {self.path}, пул будет создан заново')
+            return []
+
+    def _save(self, users: list[ProvisionedUser]):
+        descriptor = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(descriptor, 0o600)
+        with open(descriptor, 'w', encoding='utf8') as file:
+            file.write(json.dumps([user.model_dump() for user in users]))
+
+    def add(self, users: list[ProvisionedUser]):
+        if not users:
+            return
+        with self._lock:
+            self._save(self._load() + users)
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    def fill(self, size: int):
+        """Дозаполнить пул до size пользователей"""
+        missing = size - self.size()
+        if missing > 0:
+            self.add(self.factory.provision(missing, via=self.via))
+
+    @allure.step('Взять из пула {count} пользователей')
+    def lease(self, count: int) -> list[ProvisionedUser]:
+        with self._lock:
+            users = self._load()
+            taken = users[:count]
+            self._save(users[count:])
+        if taken:
+            existing = self.factory.userdata_db.get_existing_usernames([user.username for user in taken])
+            taken = [user for user in taken if user.username in existing]
+        missing = count - len(taken)
+        if missing:
+            fresh = self.factory.provision(max(missing, self.refill_size), via=self.via)
+            taken += fresh[:missing]
+            self.add(fresh[missing:])
+        return taken
@@ -0,0 +1,134 @@
+import threading
+import time
+
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.pool import QueuePool
+
+from python_test.databases.instrumentation import sql_stats
+
+
+class PoolStats:
+    """Счетчики пула за сессию и пики окна с последнего EngineRegistry.flush_metrics"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+        self.window_max_wait = 0.0
+        self.window_peak_checked_out = 0
+        self.window_peak_overflow = 0
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool с замером времени получения соединения из пула"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            self.stats.checkouts += 1
+            self.stats.total_wait += wait
+            self.stats.max_wait = max(self.stats.max_wait, wait)
+            self.stats.peak_checked_out = max(self.stats.peak_checked_out, self.checkedout())
+            self.stats.peak_overflow = max(self.stats.peak_overflow, self.overflow())
+            self.stats.window_max_wait = max(self.stats.window_max_wait, wait)
+            self.stats.window_peak_checked_out = max(self.stats.window_peak_checked_out, self.checkedout())
+            self.stats.window_peak_overflow = max(self.stats.window_peak_overflow, self.overflow())
+
+
+class EngineRegistry:
+    """Общие на процесс engine SQLAlchemy по url БД с настраиваемым пулом соединений"""
+
+    def __init__(self):
+        self.pool_size = 5
+        self.max_overflow = 10
+        self.pool_timeout = 30
+        self.pool_recycle = 1800
+        self.pool_pre_ping = True
+        self._engines: dict[str, Engine] = {}
+        self._lock = threading.Lock()
+        # checkouts и total_wait каждого engine на начало текущего окна
+        self._window_start: dict[str, tuple[int, float]] = {}
+
+    def configure(self, pool_size: int = None, max_overflow: int = None, pool_timeout: float = None,
+                  pool_recycle: int = None, pool_pre_ping: bool = None):
+        for name, value in locals().items():
+            if name != 'self' and value is not None:
+                setattr(self, name, value)
+
+    def get(self, url: str) -> Engine:
+        with self._lock:
+            if url not in self._engines:
+                self._engines[url] = create_engine(
+                    url,
+                    poolclass=TimedQueuePool,
+                    pool_size=self.pool_size,
+                    max_overflow=self.max_overflow,
+                    pool_timeout=self.pool_timeout,
+                    pool_recycle=self.pool_recycle,
+                    pool_pre_ping=self.pool_pre_ping,
+                )
+                sql_stats.instrument(self._engines[url])
+            return self._engines[url]
+
+    def metrics(self) -> dict[str, dict]:
+        """Накопленные за сессию метрики пулов"""
+        result = {}
+        for engine in self._engines.values():
+            pool = engine.pool
+            stats = pool.stats
+            result[engine.url.database] = {
+                'pool_size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': max(pool.overflow(), 0),
+                'peak_checked_out': stats.peak_checked_out,
+                'peak_overflow': max(stats.peak_overflow, 0),
+                'checkouts': stats.checkouts,
+                'avg_wait_ms': round(stats.total_wait / stats.checkouts * 1000, 2) if stats.checkouts else 0.0,
+                'max_wait_ms': round(stats.max_wait * 1000, 2),
+            }
+        return result
+
+    def flush_metrics(self) -> dict[str, dict]:
+        """Метрики пулов с прошлого вызова (для conftest - за тест) и начало нового окна.
+        Пулы без обращений в окне не попадают в результат."""
+        result = {}
+        with self._lock:
+            for url, engine in self._engines.items():
+                pool = engine.pool
+                stats = pool.stats
+                start_checkouts, start_wait = self._window_start.get(url, (0, 0.0))
+                checkouts = stats.checkouts - start_checkouts
+                if checkouts:
+                    result[engine.url.database] = {
+                        'pool_size': pool.size(),
+                        'checked_out': pool.checkedout(),
+                        'peak_checked_out': stats.window_peak_checked_out,
+                        'peak_overflow': max(stats.window_peak_overflow, 0),
+                        'checkouts': checkouts,
+                        'avg_wait_ms': round((stats.total_wait - start_wait) / checkouts * 1000, 2),
+                        'max_wait_ms': round(stats.window_max_wait * 1000, 2),
+                    }
+                self._window_start[url] = (stats.checkouts, stats.total_wait)
+                stats.window_max_wait = 0.0
+                stats.window_peak_checked_out = pool.checkedout()
+                stats.window_peak_overflow = pool.overflow()
+        return result
+
+    def dispose_all(self):
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+            self._window_start.clear()
+
+
+engines = EngineRegistry()
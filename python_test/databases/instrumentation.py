@@ -0,0 +1,116 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from typing import Literal
+
+from allure_commons.types import AttachmentType
+from sqlalchemy import Engine, event
+
+from python_test.utils.attachments import attachments
+from python_test.utils.timings import call_timings
+
+Mode = Literal['each', 'summary', 'off']
+
+
+def format_statement(statement: str, parameters) -> str:
+    """Подставить параметры в запрос для вложения, для executemany и нестандартных параметров - вывести рядом"""
+    try:
+        return statement % parameters
+    except (TypeError, ValueError, KeyError):
+        return f'{statement}\n-- parameters: {parameters}'
+
+
+class SqlTestStats:
+    """Агрегаты SQL запросов одного теста"""
+
+    def __init__(self, slowest: int):
+        self.slowest = slowest
+        self.count = 0
+        self.total_time = 0.0
+        self.commands = Counter()
+        self.top: list[tuple[float, int, str, str, object]] = []
+
+    def add(self, seq: int, command: str, database: str, statement: str, parameters, elapsed: float):
+        self.count += 1
+        self.total_time += elapsed
+        self.commands[command] += 1
+        if not self.slowest:
+            return
+        entry = (elapsed, seq, database, statement, parameters)
+        if len(self.top) < self.slowest:
+            heapq.heappush(self.top, entry)
+        elif elapsed > self.top[0][0]:
+            heapq.heapreplace(self.top, entry)
+
+    def summary(self) -> str:
+        lines = [f'Запросов: {self.count}, время в БД: {self.total_time * 1000:.1f} ms',
+                 'По командам: ' + ', '.join(f'{command} {count}' for command, count in self.commands.most_common())]
+        if self.top:
+            lines.append('\nСамые долгие запросы:')
+            for elapsed, _, database, statement, parameters in sorted(self.top, reverse=True):
+                lines.append(f'\n-- {elapsed * 1000:.1f} ms, {database}\n{format_statement(statement, parameters)}')
+        return '\n'.join(lines)
+
+
+class SqlInstrumentation:
+    """Общий обработчик SQL запросов всех engine.
+
+    Время каждого запроса замеряется по before/after_cursor_execute и агрегируется по тесту:
+    число запросов по командам, суммарное время в БД и самые долгие запросы.
+    mode:
+        each - вложение на каждый запрос, как раньше;
+        summary - одно вложение со сводкой на тест;
+        off - только агрегаты, без вложений.
+    Текст запроса с параметрами собирается только при записи вложения.
+    """
+
+    def __init__(self):
+        self.mode: Mode = 'each'
+        self.slowest = 5
+        self.current = SqlTestStats(self.slowest)
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def configure(self, config):
+        self.mode = config.getini('sql_attachments')
+        self.slowest = int(config.getini('sql_slowest'))
+        if self.mode not in ('each', 'summary', 'off'):
+            raise ValueError(f'Неизвестный режим sql_attachments: {self.mode}')
+        self.current = SqlTestStats(self.slowest)
+
+    def instrument(self, engine: Engine):
+        if not event.contains(engine, 'before_cursor_execute', self._before):
+            event.listen(engine, 'before_cursor_execute', self._before)
+            event.listen(engine, 'after_cursor_execute', self._after)
+
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info['sql_started'] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop('sql_started', time.perf_counter())
+        command = statement.split(' ', 1)[0]
+        if not command.isupper():
+            return
+        database = conn.engine.url.database
+        call_timings.record('sql', f'{command} {database}', elapsed)
+        with self._lock:
+            self.current.add(next(self._seq), command, database, statement, parameters, elapsed)
+        if self.mode == 'each':
+            attachments.attach(lambda: format_statement(statement, parameters),
+                               name=f'{command} {database} {elapsed * 1000:.1f} ms',
+                               attachment_type=AttachmentType.TEXT)
+
+    def flush(self) -> SqlTestStats:
+        """Сбросить агрегаты теста, в режиме summary вложить по ним сводку"""
+        with self._lock:
+            stats, self.current = self.current, SqlTestStats(self.slowest)
+        if stats.count and self.mode == 'summary':
+            attachments.attach(stats.summary, name=f'SQL: {stats.count} запросов, {stats.total_time * 1000:.1f} ms',
+                               attachment_type=AttachmentType.TEXT)
+        return stats
+
+
+sql_stats = SqlInstrumentation()
@@ -1,10 +1,10 @@
 from typing import Sequence
 
 import allure
-from allure_commons.types import AttachmentType
-from sqlalchemy import create_engine, Engine, event
+from sqlalchemy import Engine, delete
 from sqlmodel import Session, select
 
+from python_test.databases.engines import engines
 from python_test.model.config import Envs
 from python_test.model.db.category import Category
 from python_test.model.db.spend import Spend
@@ -14,16 +14,7 @@ class SpendDb:
     engine: Engine
 
     def __init__(self, envs: Envs):
-        self.engine = create_engine(envs.spend_db_url)
-        event.listen(self.engine, "do_execute", fn=self.attach_sql)
-
-    @staticmethod
-    def attach_sql(cursor, statement, parameters, context):
-        statement_with_params = statement % parameters
-        command_name = statement.split(" ")[0]
-        if command_name.isupper():
-            name = f'{command_name} {context.engine.url.database}'
-            allure.attach(statement_with_params, name=name, attachment_type=AttachmentType.TEXT)
+        self.engine = engines.get(envs.spend_db_url)
 
     @allure.step('Получить из БД все категории пользователя')
     def get_user_categories(self, username: str) -> Sequence[Category]:
@@ -52,6 +43,13 @@ class SpendDb:
                 session.commit()
 
     @allure.step('Удалить из БД категории из списка')
-    def delete_categories_by_ids(self, categories_ids: list[str]):
-        for category_id in categories_ids:
-            self.delete_category(category_id)
+    def delete_categories_by_ids(self, categories_ids: list[str], batch_size: int = 1000) -> int:
+        """Удалить категории вместе с их тратами одной транзакцией, вернуть число удаленных категорий"""
+        deleted = 0
+        with Session(self.engine) as session:
+            for i in range(0, len(categories_ids), batch_size):
+                batch = categories_ids[i:i + batch_size]
+                session.exec(delete(Spend).where(Spend.category_id.in_(batch)))
+                deleted += session.exec(delete(Category).where(Category.id.in_(batch))).rowcount
+            session.commit()
+        return deleted
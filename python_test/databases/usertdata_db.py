@@ -1,48 +1,66 @@
-import time
-
-import allure
-from allure_commons.types import AttachmentType
-from sqlalchemy import create_engine, Engine, event
+from sqlalchemy import Engine, delete, insert, or_
 from sqlalchemy.exc import NoResultFound
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
 
+from python_test.databases.engines import engines
 from python_test.model.config import Envs
 from python_test.model.db.user import User, Friendship
-
-
-def wait_for_record(session, model, max_retries=5, initial_delay=0.1, **filters):
-    delay = initial_delay
-    for attempt in range(max_retries):
-        try:
-            record = session.exec(select(model).filter_by(**filters)).one()
-            return record
-        except NoResultFound:
-            if attempt == max_retries - 1:
-                raise
-            time.sleep(delay)
-            delay *= 2
+from python_test.utils.waiters import exponential, wait_for
 
 
 class UserdataDb:
     engine: Engine
 
     def __init__(self, envs: Envs):
-        self.engine = create_engine(envs.userdata_db_url)
-        event.listen(self.engine, "do_execute", fn=self.attach_sql)
+        self.engine = engines.get(envs.userdata_db_url)
 
-    @staticmethod
-    def attach_sql(cursor, statement, parameters, context):
-        statement_with_params = statement % parameters
-        command_name = statement.split(" ")[0]
-        if command_name.isupper():
-            name = f'{command_name} {context.engine.url.database}'
-            allure.attach(statement_with_params, name=name, attachment_type=AttachmentType.TEXT)
-
-    def get_user(self, username: str) -> User:
+    def get_user(self, username: str, timeout: float = 1.5) -> User:
+        """Пользователь по username. Один select повторяется, пока запись не появится или не истечет timeout"""
         with Session(self.engine) as session:
-            wait_for_record(session, User, username=username)
             statement = select(User).where(User.username == username)
-            return session.exec(statement).one()
+            return wait_for(lambda: session.exec(statement).first(), timeout=timeout, backoff=exponential(0.1),
+                            raise_on_timeout=True, name='пользователя в userdata')
+
+    def get_existing_usernames(self, usernames: list[str], chunk_size: int = 1000) -> set[str]:
+        """Вернуть те username из списка, которые уже есть в таблице user"""
+        found = set()
+        with Session(self.engine) as session:
+            for i in range(0, len(usernames), chunk_size):
+                statement = select(User.username).where(User.username.in_(usernames[i:i + chunk_size]))
+                found.update(session.exec(statement).all())
+        return found
+
+    def get_users(self, usernames: list[str], chunk_size: int = 1000) -> list[User]:
+        """Вернуть пользователей из списка username, которые уже есть в таблице user"""
+        users = []
+        with Session(self.engine) as session:
+            for i in range(0, len(usernames), chunk_size):
+                statement = select(User).where(User.username.in_(usernames[i:i + chunk_size]))
+                users.extend(session.exec(statement).all())
+        return users
+
+    def get_users_with_friendships(self, usernames: list[str], chunk_size: int = 1000) -> list[User]:
+        """Пользователи вместе с дружбами в обе стороны: по select на пачку пользователей
+        и по одному selectinload на каждую связь, без запроса на каждого пользователя"""
+        users = []
+        with Session(self.engine) as session:
+            for i in range(0, len(usernames), chunk_size):
+                statement = (select(User)
+                             .where(User.username.in_(usernames[i:i + chunk_size]))
+                             .options(selectinload(User.friendships_as_requester),
+                                      selectinload(User.friendships_as_addressee)))
+                users.extend(session.exec(statement).all())
+        return users
+
+    def get_friendship_map(self, usernames: list[str]) -> dict[str, dict[str, str]]:
+        """Смежность графа дружбы requester_id -> {addressee_id: status} по связям пользователей,
+        загруженным get_users_with_friendships"""
+        adjacency: dict[str, dict[str, str]] = {}
+        for user in self.get_users_with_friendships(usernames):
+            for friendship in (*user.friendships_as_requester, *user.friendships_as_addressee):
+                adjacency.setdefault(str(friendship.requester_id), {})[str(friendship.addressee_id)] = friendship.status
+        return adjacency
 
     def get_friendship(self, user_uuid: str, user_to_uuid: str):
         with Session(self.engine) as session:
@@ -52,3 +70,30 @@ class UserdataDb:
                 return session.exec(statement).one()
             except NoResultFound:
                 return None
+
+    def insert_users(self, users: list[dict], batch_size: int = 1000) -> int:
+        """Вставить пользователей пачками executemany одной транзакцией, минуя niffler-auth"""
+        with Session(self.engine) as session:
+            for i in range(0, len(users), batch_size):
+                session.execute(insert(User), users[i:i + batch_size])
+            session.commit()
+        return len(users)
+
+    def insert_friendships(self, friendships: list[dict], batch_size: int = 1000) -> int:
+        with Session(self.engine) as session:
+            for i in range(0, len(friendships), batch_size):
+                session.execute(insert(Friendship), friendships[i:i + batch_size])
+            session.commit()
+        return len(friendships)
+
+    def delete_users(self, user_ids: list[str], batch_size: int = 1000) -> int:
+        """Удалить пользователей вместе с их дружбами одной транзакцией, вернуть число удаленных пользователей"""
+        deleted = 0
+        with Session(self.engine) as session:
+            for i in range(0, len(user_ids), batch_size):
+                batch = user_ids[i:i + batch_size]
+                session.exec(delete(Friendship).where(or_(Friendship.requester_id.in_(batch),
+                                                          Friendship.addressee_id.in_(batch))))
+                deleted += session.exec(delete(User).where(User.id.in_(batch))).rowcount
+            session.commit()
+        return deleted
@@ -1,9 +1,22 @@
+from pathlib import Path
+
 import pytest
 
-from python_test.data_helper.oauth_client import OAuthClient
+from python_test.data_helper.token_cache import DEFAULT_CACHE_DIR, CachedToken, TokenCache
 from python_test.model.config import Envs
 
 
 @pytest.fixture(scope="session")
-def auth_token(envs: Envs) -> str:
-    return OAuthClient(envs).get_token(envs.test_username, envs.test_password)
+def token_cache(request: pytest.FixtureRequest, envs: Envs) -> TokenCache:
+    cache_dir = request.config.getini('token_cache_dir')
+    return TokenCache(envs, Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR)
+
+
+@pytest.fixture(scope="session")
+def user_token(envs: Envs, token_cache: TokenCache) -> CachedToken:
+    return token_cache.get(envs.test_username, envs.test_password)
+
+
+@pytest.fixture(scope="session")
+def auth_token(user_token: CachedToken) -> str:
+    return user_token.access_token
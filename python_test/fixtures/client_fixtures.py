@@ -1,6 +1,7 @@
 import pytest
+import pytest_asyncio
 
-from python_test.data_helper.api_helper import SpendsHttpClient
+from python_test.data_helper.api_helper import AsyncSpendsHttpClient, SpendsHttpClient
 from python_test.databases.spend_db import SpendDb
 from python_test.databases.usertdata_db import UserdataDb
 from python_test.model.config import Envs
@@ -11,6 +12,12 @@ def spends_client(envs: Envs, auth_token: str) -> SpendsHttpClient:
     return SpendsHttpClient(envs, auth_token)
 
 
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def async_spends_client(envs: Envs, auth_token: str) -> AsyncSpendsHttpClient:
+    async with AsyncSpendsHttpClient(envs, auth_token) as client:
+        yield client
+
+
 @pytest.fixture(scope="session")
 def spend_db(envs: Envs) -> SpendDb:
     return SpendDb(envs)
@@ -0,0 +1,22 @@
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from python_test.data_helper.user_factory import UserFactory, UserPool
+from python_test.databases.usertdata_db import UserdataDb
+from python_test.model.config import Envs
+from python_test.model.users import ProvisionedUser
+
+
+@pytest.fixture(scope="session")
+def user_pool(request: pytest.FixtureRequest, envs: Envs, userdata_db: UserdataDb) -> UserPool:
+    path = request.config.getini('user_pool_file')
+    return UserPool(UserFactory(envs, userdata_db), Path(path) if path else None,
+                    refill_size=int(request.config.getini('user_pool_refill')))
+
+
+@pytest.fixture()
+def new_users(user_pool: UserPool) -> Callable[[int], list[ProvisionedUser]]:
+    """Выдать тесту заданное число новых, ранее не использованных пользователей"""
+    return user_pool.lease
@@ -0,0 +1,106 @@
+"""Пулы gRPC каналов с keepalive и раздачей вызовов по кругу.
+
+Пул подставляется вместо канала в сгенерированный stub: stub один раз запрашивает у канала
+multicallable на каждый метод, а пул возвращает обертку, которая на каждый вызов берет следующий канал.
+Каналы пула не делят подключения (grpc.use_local_subchannel_pool), поэтому size каналов - это size HTTP/2 соединений.
+"""
+import itertools
+from typing import Sequence
+
+import grpc
+
+DEFAULT_KEEPALIVE_MS = 30_000
+
+
+def channel_options(keepalive_ms: int = DEFAULT_KEEPALIVE_MS, keepalive_timeout_ms: int = 10_000,
+                    round_robin: bool = True) -> list[tuple[str, int | str]]:
+    options = [
+        ('grpc.keepalive_time_ms', keepalive_ms),
+        ('grpc.keepalive_timeout_ms', keepalive_timeout_ms),
+        ('grpc.keepalive_permit_without_calls', 1),
+        ('grpc.http2.max_pings_without_data', 0),
+        ('grpc.use_local_subchannel_pool', 1),
+    ]
+    if round_robin:
+        # при нескольких адресах за одним именем вызовы одного канала тоже распределяются между ними
+        options.append(('grpc.lb_policy_name', 'round_robin'))
+    return options
+
+
+class _RoundRobinMultiCallable:
+    """Multicallable одного метода, каждый вызов уходит в следующий канал пула"""
+
+    def __init__(self, callables: list):
+        # next у itertools.cycle атомарен под GIL, отдельная блокировка не нужна
+        self._next = itertools.cycle(callables).__next__
+
+    def __call__(self, request, **kwargs):
+        return self._next()(request, **kwargs)
+
+    def future(self, request, **kwargs) -> grpc.Future:
+        return self._next().future(request, **kwargs)
+
+    def with_call(self, request, **kwargs):
+        return self._next().with_call(request, **kwargs)
+
+
+class ChannelPool:
+    """Пул синхронных каналов, совместим с grpc.Channel в части unary_unary"""
+
+    def __init__(self, target: str, size: int = 1, interceptors: Sequence[grpc.UnaryUnaryClientInterceptor] = (),
+                 options: list[tuple[str, int | str]] | None = None):
+        self.target = target
+        self.options = channel_options() if options is None else options
+        self._channels = [grpc.insecure_channel(target, options=self.options) for _ in range(max(size, 1))]
+        self._intercepted = [grpc.intercept_channel(channel, *interceptors) for channel in self._channels]
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def unary_unary(self, method: str, request_serializer=None, response_deserializer=None, **kwargs):
+        return _RoundRobinMultiCallable([
+            channel.unary_unary(method, request_serializer=request_serializer,
+                                response_deserializer=response_deserializer, **kwargs)
+            for channel in self._intercepted
+        ])
+
+    def close(self):
+        for channel in self._channels:
+            channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AsyncChannelPool:
+    """Пул каналов grpc.aio. Создается внутри работающего event loop, закрывается через aclose"""
+
+    def __init__(self, target: str, size: int = 1, interceptors: Sequence[grpc.aio.ClientInterceptor] = (),
+                 options: list[tuple[str, int | str]] | None = None):
+        self.target = target
+        self.options = channel_options() if options is None else options
+        self._channels = [grpc.aio.insecure_channel(target, options=self.options, interceptors=list(interceptors))
+                          for _ in range(max(size, 1))]
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def unary_unary(self, method: str, request_serializer=None, response_deserializer=None, **kwargs):
+        return _RoundRobinMultiCallable([
+            channel.unary_unary(method, request_serializer=request_serializer,
+                                response_deserializer=response_deserializer, **kwargs)
+            for channel in self._channels
+        ])
+
+    async def aclose(self):
+        for channel in self._channels:
+            await channel.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
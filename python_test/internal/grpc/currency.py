@@ -0,0 +1,57 @@
+import asyncio
+from collections import deque
+from typing import Iterable
+
+import grpc
+from google.protobuf import empty_pb2
+
+from internal.pb.niffler_currency_pb2 import CalculateRequest, CalculateResponse, CurrencyResponse
+from internal.pb.niffler_currency_pb2_pbreflect import NifflerCurrencyServiceClient, _NifflerCurrencyServiceStub
+
+
+class CurrencyClient(NifflerCurrencyServiceClient):
+    """Синхронный клиент niffler-currency с пакетной конвертацией.
+    Принимает канал или ChannelPool."""
+
+    def calculate_rate_many(self, requests: Iterable[CalculateRequest], max_in_flight: int = 256,
+                            metadata: list[tuple[str, str]] | None = None,
+                            timeout: float | None = None) -> list[CalculateResponse]:
+        """Отправить запросы конкурентно, не более max_in_flight одновременно.
+        Ответы возвращаются в порядке запросов, первая ошибка RPC пробрасывается."""
+        responses = []
+        in_flight: deque[grpc.Future] = deque()
+        for request in requests:
+            if len(in_flight) >= max_in_flight:
+                responses.append(in_flight.popleft().result())
+            in_flight.append(self._stub.CalculateRate.future(request, metadata=metadata, timeout=timeout))
+        responses.extend(future.result() for future in in_flight)
+        return responses
+
+
+class AsyncCurrencyClient:
+    """Асинхронный аналог CurrencyClient поверх grpc.aio канала или AsyncChannelPool"""
+
+    def __init__(self, channel: grpc.aio.Channel) -> None:
+        self._stub = _NifflerCurrencyServiceStub(channel)
+
+    async def get_all_currencies(self, request: empty_pb2.Empty,
+                                 metadata: list[tuple[str, str]] | None = None,
+                                 timeout: float | None = None) -> CurrencyResponse:
+        return await self._stub.GetAllCurrencies(request, metadata=metadata, timeout=timeout)
+
+    async def calculate_rate(self, request: CalculateRequest,
+                             metadata: list[tuple[str, str]] | None = None,
+                             timeout: float | None = None) -> CalculateResponse:
+        return await self._stub.CalculateRate(request, metadata=metadata, timeout=timeout)
+
+    async def calculate_rate_many(self, requests: Iterable[CalculateRequest], concurrency: int = 256,
+                                  metadata: list[tuple[str, str]] | None = None,
+                                  timeout: float | None = None) -> list[CalculateResponse]:
+        """Отправить запросы конкурентно, не более concurrency одновременно. Ответы в порядке запросов."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _limited(request: CalculateRequest) -> CalculateResponse:
+            async with semaphore:
+                return await self.calculate_rate(request, metadata=metadata, timeout=timeout)
+
+        return await asyncio.gather(*(_limited(request) for request in requests))
@@ -0,0 +1,4 @@
+def method_name(client_call_details) -> str:
+    """Имя метода вызова: grpc.aio передает его байтами"""
+    method = client_call_details.method
+    return method.decode('utf8') if isinstance(method, bytes) else method
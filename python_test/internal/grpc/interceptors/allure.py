@@ -5,13 +5,37 @@ import grpc
 from google.protobuf.message import Message
 from google.protobuf.json_format import MessageToJson
 
+from internal.grpc.interceptors import method_name
+from python_test.utils.attachments import attachments
+
+
+def _response_json(call: grpc.Future) -> str:
+    error = call.exception()
+    return str(error) if error else MessageToJson(call.result())
+
 
 class AllureInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """Ответ прикрепляется по готовности вызова: вызовы через future (calculate_rate_many) не блокируются"""
 
     def intercept_unary_unary(self, continuation: Callable, client_call_details: grpc.ClientCallDetails,
                               request: Message) -> Callable:
         with allure.step(client_call_details.method):
-            allure.attach(MessageToJson(request), 'request', attachment_type=allure.attachment_type.JSON)
+            attachments.attach(lambda: MessageToJson(request), 'request', attachment_type=allure.attachment_type.JSON)
             response = continuation(client_call_details, request)
-            allure.attach(MessageToJson(response.result()), 'response', attachment_type=allure.attachment_type.JSON)
+            attachments.attach_when_done(response, _response_json, 'response',
+                                         attachment_type=allure.attachment_type.JSON)
         return response
+
+
+class AsyncAllureInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    """Шаг пишется после получения ответа: стек шагов allure не переживает переключение конкурентных корутин"""
+
+    async def intercept_unary_unary(self, continuation: Callable, client_call_details: grpc.aio.ClientCallDetails,
+                                    request: Message) -> grpc.aio.UnaryUnaryCall:
+        call = await continuation(client_call_details, request)
+        response = await call
+        with allure.step(method_name(client_call_details)):
+            attachments.attach(lambda: MessageToJson(request), 'request', attachment_type=allure.attachment_type.JSON)
+            attachments.attach(lambda: MessageToJson(response), 'response',
+                               attachment_type=allure.attachment_type.JSON)
+        return call
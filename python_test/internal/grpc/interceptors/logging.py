@@ -3,6 +3,8 @@ from typing import Callable
 import grpc
 from google.protobuf.message import Message
 
+from internal.grpc.interceptors import method_name
+
 
 class LoggingInterceptor(grpc.UnaryUnaryClientInterceptor):
 
@@ -11,5 +13,17 @@ class LoggingInterceptor(grpc.UnaryUnaryClientInterceptor):
         print(client_call_details.method)
         print(request)
         response = continuation(client_call_details, request)
-        print(response.result())
+        # ответ печатается по готовности, чтобы не блокировать вызовы через future
+        response.add_done_callback(lambda call: print(call.exception() or call.result()))
         return response
+
+
+class AsyncLoggingInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+
+    async def intercept_unary_unary(self, continuation: Callable, client_call_details: grpc.aio.ClientCallDetails,
+                                    request: Message) -> grpc.aio.UnaryUnaryCall:
+        print(method_name(client_call_details))
+        print(request)
+        call = await continuation(client_call_details, request)
+        print(await call)
+        return call
@@ -0,0 +1,32 @@
+import time
+from typing import Callable
+
+import grpc
+from google.protobuf.message import Message
+
+from internal.grpc.interceptors import method_name
+from python_test.utils.timings import call_timings
+
+
+class TimingInterceptor(grpc.UnaryUnaryClientInterceptor):
+
+    def intercept_unary_unary(self, continuation: Callable, client_call_details: grpc.ClientCallDetails,
+                              request: Message) -> Callable:
+        started = time.perf_counter()
+        response = continuation(client_call_details, request)
+        response.add_done_callback(
+            lambda _: call_timings.record('grpc', client_call_details.method, time.perf_counter() - started))
+        return response
+
+
+class AsyncTimingInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+
+    async def intercept_unary_unary(self, continuation: Callable, client_call_details: grpc.aio.ClientCallDetails,
+                                    request: Message) -> grpc.aio.UnaryUnaryCall:
+        started = time.perf_counter()
+        call = await continuation(client_call_details, request)
+        try:
+            await call
+        finally:
+            call_timings.record('grpc', method_name(client_call_details), time.perf_counter() - started)
+        return call
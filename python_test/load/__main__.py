@@ -0,0 +1,46 @@
+"""Нагрузочный прогон на базе API клиентов автотестов.
+
+Запуск из каталога python_test:
+    python -m load --mix mock --concurrency 8 --duration 60
+    python -m load --mix full --rps 200 --concurrency 16 --executor process
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from python_test.load.report import build_report, write_report
+from python_test.load.runner import run_load
+from python_test.load.scenarios import OPERATIONS, PROFILES, parse_mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон Niffler')
+    parser.add_argument('--mix', default='mock',
+                        help=f'профиль ({", ".join(PROFILES)}) или веса операций: '
+                             f'currency.get_all=1,soap.friends=3. Операции: {", ".join(OPERATIONS)}')
+    parser.add_argument('--duration', type=float, default=30, help='длительность в секундах')
+    parser.add_argument('--concurrency', type=int, default=4, help='количество воркеров')
+    parser.add_argument('--rps', type=float, default=None, help='целевой RPS, по умолчанию без ограничения')
+    parser.add_argument('--executor', choices=('thread', 'process'), default='thread')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--out', default='load-results', help='каталог для report.json и report.html')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    mix = parse_mix(args.mix)
+    samples, duration = run_load(mix, args.duration, args.concurrency, args.rps, args.executor, args.seed)
+
+    settings = {'mix': mix, 'concurrency': args.concurrency, 'rps': args.rps, 'executor': args.executor}
+    report = build_report(samples, duration, settings)
+    json_path, html_path = write_report(report, args.out)
+    total = report['total']
+    logging.info(f'{total["requests"]} запросов, {total["throughput_rps"]} rps, '
+                 f'p95 {total["p95_ms"]} ms, ошибок {total["error_rate"]:.2%}')
+    logging.info(f'Отчет: {json_path}, {html_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import json
+from collections import defaultdict
+from pathlib import Path
+
+from python_test.load.runner import Sample
+from python_test.utils.stats import latency_summary_ms
+from python_test.utils.templates import templates
+
+
+def _stats(samples: list[Sample], duration: float) -> dict:
+    errors = sum(1 for sample in samples if sample[3] is not None)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'throughput_rps': round(len(samples) / duration, 2) if duration else 0.0,
+        **latency_summary_ms([sample[2] for sample in samples]),
+    }
+
+
+def build_report(samples: list[Sample], duration: float, settings: dict) -> dict:
+    by_operation = defaultdict(list)
+    for sample in samples:
+        by_operation[sample[0]].append(sample)
+    first_errors = {}
+    for name, _, _, error in samples:
+        if error is not None:
+            first_errors.setdefault(name, error)
+    return {
+        'settings': settings,
+        'duration_s': duration,
+        'total': _stats(samples, duration),
+        'operations': {name: _stats(items, duration) for name, items in sorted(by_operation.items())},
+        'first_errors': first_errors,
+    }
+
+
+def write_report(report: dict, out_dir: str) -> tuple[Path, Path]:
+    """Сохранить отчет в report.json и report.html"""
+    path = Path(out_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    json_path = path / 'report.json'
+    json_path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf8')
+
+    html_path = path / 'report.html'
+    html_path.write_text(templates.render('load-report.html', report=report), encoding='utf8')
+    return json_path, html_path
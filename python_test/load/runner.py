@@ -0,0 +1,67 @@
+import logging
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Literal
+
+from python_test.load.scenarios import OPERATIONS, LoadContext
+
+# (операция, время старта от начала прогона, задержка в секундах, текст ошибки или None)
+Sample = tuple[str, float, float, str | None]
+
+
+def run_worker(worker_id: int, mix: dict[str, int], duration: float, rate: float | None,
+               context: LoadContext | None = None, seed: int | None = None) -> list[Sample]:
+    """Выполнять операции из mix в течение duration секунд.
+    rate - целевое число операций в секунду для воркера, None - без ограничения (режим concurrency)."""
+    own_context = context is None
+    if own_context:
+        context = LoadContext()
+        context.warm_up(list(mix))
+    rnd = random.Random(None if seed is None else seed + worker_id)
+    names, weights = list(mix), list(mix.values())
+    interval = 1 / rate if rate else 0
+    samples = []
+    started = time.perf_counter()
+    next_at = started
+    while (now := time.perf_counter()) - started < duration:
+        if interval:
+            if now < next_at:
+                time.sleep(next_at - now)
+            next_at += interval
+        name = rnd.choices(names, weights)[0]
+        op_start = time.perf_counter()
+        error = None
+        try:
+            OPERATIONS[name](context)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+        samples.append((name, op_start - started, time.perf_counter() - op_start, error))
+    if own_context:
+        context.cleanup()
+    return samples
+
+
+def run_load(mix: dict[str, int], duration: float, concurrency: int, rps: float | None = None,
+             executor: Literal['thread', 'process'] = 'thread',
+             seed: int | None = None) -> tuple[list[Sample], float]:
+    """Запустить concurrency воркеров в потоках или процессах.
+    При заданном rps нагрузка делится между воркерами поровну.
+    Возвращает замеры и фактическую длительность нагрузки без учета подготовки клиентов."""
+    rate = rps / concurrency if rps else None
+    operations = list(mix)
+    context = LoadContext(pool_size=concurrency)
+    context.warm_up(operations)
+    started = time.perf_counter()
+    logging.info(f'Старт нагрузки: {concurrency} воркеров ({executor}), rps={rps or "max"}, {duration}s')
+    if executor == 'process':
+        with ProcessPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(run_worker, i, mix, duration, rate, None, seed) for i in range(concurrency)]
+            samples = [sample for future in futures for sample in future.result()]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(run_worker, i, mix, duration, rate, context, seed) for i in range(concurrency)]
+            samples = [sample for future in futures for sample in future.result()]
+    elapsed = round(time.perf_counter() - started, 3)
+    context.cleanup()
+    return samples, elapsed
@@ -0,0 +1,103 @@
+import os
+from functools import cached_property
+from typing import Callable
+
+from dotenv import load_dotenv
+from google.protobuf import empty_pb2
+
+from internal.grpc.channels import ChannelPool
+from internal.grpc.currency import CurrencyClient
+from internal.pb.niffler_currency_pb2 import CalculateRequest, CurrencyValues
+from python_test.data_helper.api_helper import SpendsHttpClient
+from python_test.data_helper.token_cache import TokenCache
+from python_test.model.config import Envs
+from python_test.resources.templates.read_templates import current_user_xml, friends
+from python_test.utils.sessions import PlainSession
+
+
+class LoadContext:
+    """Клиенты для нагрузочного прогона. Клиент создается только при первом обращении,
+    поэтому для профиля mock достаточно GRPC_HOST и SOAP_ADDRESS.
+    HTTP запросы идут через PlainSession: без allure вложений и логирования, задержка - это задержка сервиса."""
+
+    def __init__(self, pool_size: int = 10):
+        load_dotenv()
+        self.pool_size = pool_size
+        self.username = os.getenv('TEST_USERNAME', 'qa_guru')
+        # id трат, созданных прогоном: удаляются только они, остальные траты пользователя не трогаем
+        self.created_spends: list[str] = []
+
+    @cached_property
+    def spends(self) -> SpendsHttpClient:
+        envs = Envs.from_os_environ()
+        token = TokenCache(envs).get(envs.test_username, envs.test_password).access_token
+        return SpendsHttpClient(envs, token, session=PlainSession(envs.gateway_url, self.pool_size))
+
+    @cached_property
+    def currency(self) -> CurrencyClient:
+        return CurrencyClient(ChannelPool(os.getenv('GRPC_HOST'), size=max(self.pool_size // 4, 1)))
+
+    @cached_property
+    def soap(self) -> PlainSession:
+        session = PlainSession(os.getenv('SOAP_ADDRESS'), self.pool_size)
+        session.headers.update({'Content-Type': 'text/xml;charset=UTF-8'})
+        return session
+
+    def warm_up(self, operations: list[str]):
+        """Создать клиенты заранее, чтобы не делать это конкурентно из потоков"""
+        for client_name in {operation.split('.')[0] for operation in operations}:
+            getattr(self, CLIENTS[client_name])
+
+    def add_spend(self):
+        # list.append атомарен под GIL, воркеры-потоки пишут в один список без блокировки
+        self.created_spends.append(self.spends.add_spend('load', 100).id)
+
+    def cleanup(self):
+        """Удалить траты, созданные этим контекстом"""
+        if self.created_spends:
+            self.spends.delete_spends_bulk(self.created_spends)
+            self.created_spends.clear()
+
+
+CLIENTS = {'spends': 'spends', 'categories': 'spends', 'currency': 'currency', 'soap': 'soap'}
+
+OPERATIONS: dict[str, Callable[[LoadContext], object]] = {
+    'spends.add': lambda ctx: ctx.add_spend(),
+    'spends.all': lambda ctx: ctx.spends.get_all_spends(),
+    'categories.all': lambda ctx: ctx.spends.get_ids_all_categories(),
+    'currency.calculate_rate': lambda ctx: ctx.currency.calculate_rate(
+        CalculateRequest(spendCurrency=CurrencyValues.USD, desiredCurrency=CurrencyValues.RUB, amount=100.0)
+    ),
+    'currency.get_all': lambda ctx: ctx.currency.get_all_currencies(empty_pb2.Empty()),
+    'soap.current_user': lambda ctx: ctx.soap.post('', data=current_user_xml(ctx.username)),
+    'soap.friends': lambda ctx: ctx.soap.post('', data=friends(ctx.username)),
+}
+
+PROFILES: dict[str, dict[str, int]] = {
+    'full': {
+        'spends.all': 4,
+        'spends.add': 1,
+        'categories.all': 2,
+        'currency.calculate_rate': 4,
+        'currency.get_all': 1,
+        'soap.current_user': 2,
+        'soap.friends': 1,
+    },
+    'mock': {
+        'currency.calculate_rate': 5,
+        'currency.get_all': 1,
+    },
+}
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    """Имя профиля из PROFILES либо строка вида 'currency.get_all=1,soap.friends=3'"""
+    if mix in PROFILES:
+        return PROFILES[mix]
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        if name not in OPERATIONS:
+            raise ValueError(f'Неизвестная операция {name}, доступны: {", ".join(OPERATIONS)}')
+        weights[name] = int(weight or 1)
+    return weights
@@ -6,3 +6,4 @@ class TestData:
                                                  ids=lambda param: param['category_name'])
     spend = lambda x: pytest.mark.parametrize("spend", [x], indirect=True,
                                               ids=lambda param: f'{param['category']},{param['amount']}')
+    spends = lambda x: pytest.mark.parametrize("spends", [x], indirect=True, ids=lambda param: f'{len(param)} spends')
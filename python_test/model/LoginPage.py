@@ -1,3 +1,6 @@
+import json
+from urllib.parse import urlsplit
+
 import allure
 from selenium.webdriver.common.by import By
 
@@ -42,6 +45,22 @@ class LoginPage(BasePage):
         self.fill_password(password)
         self.click_log_in()
 
+    @allure.step('Авторизоваться через API, без формы логина')
+    def login_by_token(self, id_token: str, auth_cookies: dict[str, str]):
+        """Положить cookies сервиса авторизации и id_token в localStorage фронта до первой загрузки страницы"""
+        for name, value in auth_cookies.items():
+            self.wd.execute_cdp_cmd('Network.setCookie', {'name': name, 'value': value, 'url': self.auth_url})
+        frontend = urlsplit(self.base_url)
+        origin = f'{frontend.scheme}://{frontend.netloc}'
+        script = self.wd.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+            'source': f"if (location.origin === {json.dumps(origin)}) "
+                      f"localStorage.setItem('id_token', {json.dumps(id_token)});"
+        })
+        try:
+            self.wd.get(self.base_url)
+        finally:
+            self.wd.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': script['identifier']})
+
     @allure.step('Получить текст ошибки формы')
     def get_text_form_error(self):
         return self.find_element(self.FORM_ERROR_NOTIFY).text
@@ -1,3 +1,5 @@
+import os
+
 from pydantic import BaseModel
 
 
@@ -13,3 +15,19 @@ class Envs(BaseModel):
     userdata_db_url: str
     soap_address: str
     grpc_service_host: str
+
+    @classmethod
+    def from_os_environ(cls) -> 'Envs':
+        return cls(
+            frontend_url=os.getenv("FRONTEND_URL"),
+            gateway_url=os.getenv("GATEWAY_URL"),
+            auth_url=os.getenv('AUTH_URL'),
+            auth_secret=os.getenv("AUTH_SECRET"),
+            spend_db_url=os.getenv("SPEND_DB_URL"),
+            test_username=os.getenv("TEST_USERNAME"),
+            test_password=os.getenv("TEST_PASSWORD"),
+            kafka_address=os.getenv("KAFKA_ADDRESS"),
+            userdata_db_url=os.getenv('USERDATA_DB_URL'),
+            soap_address=os.getenv("SOAP_ADDRESS"),
+            grpc_service_host=os.getenv('GRPC_HOST'),
+        )
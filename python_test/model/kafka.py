@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+
+
+class ProduceStats(BaseModel):
+    sent: int
+    delivered: int
+    failed: int
+    bytes_sent: int
+    elapsed_s: float
+    msgs_per_s: float
+    bytes_per_s: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+class IngestionReport(BaseModel):
+    messages: int
+    arrived: int
+    missing: int
+    produce: ProduceStats
+    ingestion_rate: float
+    max_consumer_lag: int
+    lag_samples: list[int]
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
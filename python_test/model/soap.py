@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+
+
+class SoapUser(BaseModel):
+    """Пользователь из ответа niffler-userdata (тип user в userdata.xsd)"""
+    id: str | None = None
+    username: str
+    firstname: str | None = None
+    surname: str | None = None
+    fullname: str | None = None
+    currency: str | None = None
+    photo: str | None = None
+    photo_small: str | None = None
+    friendship_status: str | None = None
+
+
+class UsersPage(BaseModel):
+    """Ответ usersResponse: список пользователей и, для постраничных запросов, данные страницы"""
+    users: list[SoapUser] = []
+    size: int | None = None
+    number: int | None = None
+    total_elements: int | None = None
+    total_pages: int | None = None
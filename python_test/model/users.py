@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class ProvisionedUser(BaseModel):
+    """Заранее созданный пользователь. Без пароля - создан через Kafka и есть только в userdata"""
+    username: str
+    password: str | None = None
+    id: str
@@ -0,0 +1,86 @@
+"""Запись длительностей тестов, фикстур и внешних вызовов в историю прогонов (plugins/history.py).
+
+Тесты пишет контроллер по отчетам фаз, фикстуры и внешние вызовы - процесс, который их выполнял.
+Идентификатор прогона контроллер передает воркерам xdist через workerinput.
+"""
+import os
+import sys
+import time
+import uuid
+
+import pytest
+
+from python_test.plugins.history import DurationStore
+from python_test.utils.timings import call_timings
+
+
+def pytest_addoption(parser):
+    parser.addini('durations_db', default='.test-durations.sqlite',
+                  help='SQLite файл истории длительностей относительно rootdir, пусто - не записывать')
+
+
+def durations_store(config) -> DurationStore | None:
+    path = config.getini('durations_db')
+    return DurationStore(config.rootpath / path) if path else None
+
+
+def _is_controller(config) -> bool:
+    return not hasattr(config, 'workerinput')
+
+
+class DurationRecorder:
+
+    def __init__(self, config, store: DurationStore):
+        self.config = config
+        self.store = store
+        self.started = time.time()
+        if _is_controller(config):
+            self.run_id = uuid.uuid4().hex
+        else:
+            self.run_id = config.workerinput['durations_run_id']
+        self.worker = os.environ.get('PYTEST_XDIST_WORKER', 'master')
+        self.tests: dict[str, dict] = {}
+        self.fixtures: list[tuple] = []
+
+    def pytest_configure_node(self, node):
+        node.workerinput['durations_run_id'] = self.run_id
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item):
+        call_timings.current = item.nodeid
+        yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        started = time.perf_counter()
+        yield
+        self.fixtures.append((call_timings.current, fixturedef.argname, fixturedef.scope,
+                              time.perf_counter() - started))
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport):
+        if not _is_controller(self.config):
+            return
+        node = getattr(report, 'node', None)
+        test = self.tests.setdefault(report.nodeid.split('@')[0], {
+            'worker': node.workerinput['workerid'] if node else 'master',
+            'outcome': 'passed', 'setup': 0.0, 'call': 0.0, 'teardown': 0.0, 'start': report.start, 'stop': 0.0,
+        })
+        test[report.when] = report.duration
+        test['stop'] = report.stop
+        if report.failed:
+            test['outcome'] = 'failed'
+        elif report.skipped and report.when != 'teardown':
+            test['outcome'] = 'skipped'
+
+    def pytest_sessionfinish(self, session):
+        self.store.save_worker(self.run_id, self.worker, self.fixtures, call_timings.drain())
+        if _is_controller(self.config) and self.tests:
+            workers = self.config.getoption('numprocesses', None) or 1
+            tests = [(nodeid, t['worker'], t['outcome'], t['setup'], t['call'], t['teardown'], t['start'], t['stop'])
+                     for nodeid, t in self.tests.items()]
+            self.store.save_run(self.run_id, self.started, workers, ' '.join(sys.argv[1:]), tests)
+
+
+def pytest_configure(config):
+    if store := durations_store(config):
+        config.pluginmanager.register(DurationRecorder(config, store), 'duration-recorder')
@@ -0,0 +1,159 @@
+"""История длительностей тестов, фикстур и внешних вызовов в SQLite.
+
+Отчет по последним прогонам, из каталога python_test:
+    python -m plugins.history --db .test-durations.sqlite --runs 10 --top 15
+"""
+import argparse
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (id TEXT PRIMARY KEY, started REAL, finished REAL, workers INTEGER, args TEXT);
+CREATE TABLE IF NOT EXISTS tests (run_id TEXT, nodeid TEXT, worker TEXT, outcome TEXT,
+                                  setup REAL, call REAL, teardown REAL, start REAL, stop REAL);
+CREATE TABLE IF NOT EXISTS fixtures (run_id TEXT, worker TEXT, nodeid TEXT, fixture TEXT, scope TEXT, duration REAL);
+CREATE TABLE IF NOT EXISTS calls (run_id TEXT, worker TEXT, nodeid TEXT, kind TEXT, target TEXT,
+                                  count INTEGER, total REAL, max REAL);
+CREATE INDEX IF NOT EXISTS tests_run ON tests (run_id);
+CREATE INDEX IF NOT EXISTS fixtures_run ON fixtures (run_id);
+CREATE INDEX IF NOT EXISTS calls_run ON calls (run_id);
+"""
+
+
+class DurationStore:
+    """Хранилище истории прогонов. Каждый процесс (контроллер и воркеры xdist) пишет свою часть одной транзакцией"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+    def save_run(self, run_id: str, started: float, workers: int, args: str, tests: list[tuple]):
+        with closing(self._connect()) as connection, connection:
+            connection.execute('INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)',
+                               (run_id, started, time.time(), workers, args))
+            connection.executemany('INSERT INTO tests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                   [(run_id, *test) for test in tests])
+
+    def save_worker(self, run_id: str, worker: str, fixtures: list[tuple], calls: list[tuple]):
+        with closing(self._connect()) as connection, connection:
+            connection.executemany('INSERT INTO fixtures VALUES (?, ?, ?, ?, ?, ?)',
+                                   [(run_id, worker, *fixture) for fixture in fixtures])
+            connection.executemany('INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                   [(run_id, worker, *call) for call in calls])
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        if not self.path.exists():
+            return []
+        with closing(self._connect()) as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def last_runs(self, count: int) -> list[str]:
+        return [row[0] for row in self._query('SELECT id FROM runs ORDER BY started DESC LIMIT ?', (count,))]
+
+    def test_durations(self, runs: int = 5) -> dict[str, float]:
+        """Средняя длительность теста (setup + call + teardown) за последние прогоны"""
+        return dict(self._query("""
+            SELECT nodeid, AVG(setup + call + teardown) FROM tests
+            WHERE run_id IN (SELECT id FROM runs ORDER BY started DESC LIMIT ?)
+            GROUP BY nodeid""", (runs,)))
+
+    def slowest_tests(self, runs: int, top: int) -> list[tuple]:
+        return self._query("""
+            SELECT nodeid, COUNT(*), AVG(setup + call + teardown), MAX(setup + call + teardown) FROM tests
+            WHERE run_id IN (SELECT id FROM runs ORDER BY started DESC LIMIT ?)
+            GROUP BY nodeid ORDER BY 3 DESC LIMIT ?""", (runs, top))
+
+    def slowest_fixtures(self, runs: int, top: int) -> list[tuple]:
+        return self._query("""
+            SELECT fixture, scope, COUNT(*), SUM(duration), AVG(duration), MAX(duration) FROM fixtures
+            WHERE run_id IN (SELECT id FROM runs ORDER BY started DESC LIMIT ?)
+            GROUP BY fixture, scope ORDER BY 4 DESC LIMIT ?""", (runs, top))
+
+    def slowest_calls(self, runs: int, top: int) -> list[tuple]:
+        return self._query("""
+            SELECT kind, target, SUM(count), SUM(total), SUM(total) / SUM(count), MAX(max) FROM calls
+            WHERE run_id IN (SELECT id FROM runs ORDER BY started DESC LIMIT ?)
+            GROUP BY kind, target ORDER BY 4 DESC LIMIT ?""", (runs, top))
+
+    def trends(self, runs: int, top: int) -> list[tuple]:
+        """Тесты, сильнее всего замедлившиеся в последнем прогоне относительно среднего по предыдущим"""
+        run_ids = self.last_runs(runs)
+        if len(run_ids) < 2:
+            return []
+        placeholders = ','.join('?' * (len(run_ids) - 1))
+        return self._query(f"""
+            SELECT last.nodeid, prev.avg, last.duration, last.duration / prev.avg FROM
+                (SELECT nodeid, setup + call + teardown AS duration FROM tests WHERE run_id = ?) AS last
+            JOIN (SELECT nodeid, AVG(setup + call + teardown) AS avg FROM tests
+                  WHERE run_id IN ({placeholders}) GROUP BY nodeid) AS prev ON prev.nodeid = last.nodeid
+            WHERE prev.avg > 0 ORDER BY 4 DESC LIMIT ?""", (run_ids[0], *run_ids[1:], top))
+
+    def critical_path(self, run_id: str, top: int) -> list[dict]:
+        """Загрузка воркеров в прогоне: занятость, простой и самые долгие тесты.
+        Первый в списке воркер закончил последним и определил длительность прогона."""
+        rows = self._query('SELECT worker, nodeid, setup + call + teardown, start, stop FROM tests '
+                           'WHERE run_id = ? ORDER BY start', (run_id,))
+        workers: dict[str, list[tuple]] = {}
+        for worker, *test in rows:
+            workers.setdefault(worker, []).append(tuple(test))
+        result = []
+        for worker, tests in workers.items():
+            span = max(test[3] for test in tests) - min(test[2] for test in tests)
+            busy = sum(test[1] for test in tests)
+            result.append({
+                'worker': worker,
+                'tests': len(tests),
+                'finished': max(test[3] for test in tests),
+                'span_s': round(span, 2),
+                'busy_s': round(busy, 2),
+                'idle_s': round(max(span - busy, 0), 2),
+                'slowest': sorted(((nodeid, round(duration, 2)) for nodeid, duration, *_ in tests),
+                                  key=lambda test: -test[1])[:top],
+            })
+        return sorted(result, key=lambda worker: -worker['finished'])
+
+
+def print_report(store: DurationStore, runs: int, top: int):
+    run_ids = store.last_runs(runs)
+    if not run_ids:
+        print(f'В {store.path} нет прогонов')
+        return
+    print(f'Прогонов в выборке: {len(run_ids)}\n\nСамые долгие тесты (avg / max, s):')
+    for nodeid, count, avg, maximum in store.slowest_tests(runs, top):
+        print(f'  {avg:8.2f} {maximum:8.2f}  x{count}  {nodeid}')
+    print('\nСамые долгие фикстуры (sum / avg / max, s):')
+    for fixture, scope, count, total, avg, maximum in store.slowest_fixtures(runs, top):
+        print(f'  {total:8.2f} {avg:8.2f} {maximum:8.2f}  x{count}  {fixture} [{scope}]')
+    print('\nВнешние вызовы (sum / avg / max, s):')
+    for kind, target, count, total, avg, maximum in store.slowest_calls(runs, top):
+        print(f'  {total:8.2f} {avg:8.3f} {maximum:8.3f}  x{count}  {kind} {target}')
+    if trends := store.trends(runs, top):
+        print('\nЗамедление в последнем прогоне (prev avg -> last, s):')
+        for nodeid, avg, last, ratio in trends:
+            print(f'  {avg:8.2f} -> {last:8.2f}  x{ratio:.2f}  {nodeid}')
+    print('\nКритический путь последнего прогона по воркерам:')
+    for worker in store.critical_path(run_ids[0], top=3):
+        print(f"  {worker['worker']}: {worker['tests']} тестов, span {worker['span_s']}s, "
+              f"busy {worker['busy_s']}s, idle {worker['idle_s']}s")
+        for nodeid, duration in worker['slowest']:
+            print(f'      {duration:8.2f}  {nodeid}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Отчет по истории длительностей тестов')
+    parser.add_argument('--db', default='.test-durations.sqlite', help='Файл истории')
+    parser.add_argument('--runs', type=int, default=10, help='Сколько последних прогонов учитывать')
+    parser.add_argument('--top', type=int, default=15, help='Размер топов')
+    args = parser.parse_args()
+    print_report(DurationStore(Path(args.db)), args.runs, args.top)
+
+
+if __name__ == '__main__':
+    main()
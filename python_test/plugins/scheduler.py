@@ -0,0 +1,75 @@
+"""Распределение тестов по воркерам xdist по маркерам parallel/sequential.
+
+Тесты с маркером sequential собираются в одну группу xdist_group и выполняются одним воркером,
+остальные раздаются воркерам по одному, начиная с самых долгих по истории прошлых прогонов.
+История длительностей берется из durations_db (plugins/durations.py), среднее за последние прогоны.
+"""
+import statistics
+
+import pytest
+
+from python_test.plugins.durations import durations_store
+
+SEQUENTIAL_GROUP = 'sequential'
+DEFAULT_DURATION = 1.0
+HISTORY_RUNS = 5
+
+
+def pytest_addoption(parser):
+    parser.addini('schedule_by_markers', type='bool', default=True,
+                  help='При запуске с -n: sequential тесты на одном воркере, parallel - по истории длительностей')
+
+
+def load_durations(config) -> dict[str, float]:
+    store = durations_store(config)
+    return store.test_durations(HISTORY_RUNS) if store else {}
+
+
+def _is_controller(config) -> bool:
+    return not hasattr(config, 'workerinput')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'parallel: тест можно выполнять параллельно с другими')
+    config.addinivalue_line('markers', 'sequential: тесты выполняются последовательно на одном воркере')
+    config.addinivalue_line('markers', 'perf: замеры производительности, не входят в обычный прогон')
+    if not config.getini('schedule_by_markers'):
+        return
+    if _is_controller(config) and config.getoption('dist', 'no') == 'load':
+        config.option.dist = 'loadgroup'
+    elif not _is_controller(config) and config.workerinput.get('loadgroup'):
+        # воркер заново разбирает аргументы командной строки и не знает о замене dist на контроллере
+        config.option.loadgroup = True
+
+
+def pytest_configure_node(node):
+    node.workerinput['loadgroup'] = node.config.getoption('dist', 'no') == 'loadgroup'
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items: list[pytest.Item]):
+    if not config.getini('schedule_by_markers'):
+        return
+    for item in items:
+        if item.get_closest_marker(SEQUENTIAL_GROUP) and not item.get_closest_marker('xdist_group'):
+            item.add_marker(pytest.mark.xdist_group(SEQUENTIAL_GROUP))
+    if config.getoption('loadgroup', False):
+        items[:] = order_longest_first(items, load_durations(config))
+
+
+def _group(item: pytest.Item) -> str | None:
+    marker = item.get_closest_marker('xdist_group')
+    if marker is None:
+        return None
+    return marker.args[0] if marker.args else marker.kwargs.get('name', 'default')
+
+
+def order_longest_first(items: list[pytest.Item], durations: dict[str, float]) -> list[pytest.Item]:
+    """Упорядочить группы и одиночные тесты по убыванию суммарной длительности.
+    Внутри группы порядок тестов не меняется, тесты без истории считаются медианной длительностью."""
+    default = statistics.median(durations.values()) if durations else DEFAULT_DURATION
+    units: dict[str, list[pytest.Item]] = {}
+    for item in items:
+        units.setdefault(_group(item) or item.nodeid, []).append(item)
+    ordered = sorted(units.values(), key=lambda unit: -sum(durations.get(i.nodeid, default) for i in unit))
+    return [item for unit in ordered for item in unit]
@@ -1,51 +1,56 @@
-from jinja2 import Environment, select_autoescape, FileSystemLoader
+from typing import Iterable, Iterator
 
-env = Environment(
-    loader=FileSystemLoader('.'),
-    autoescape=select_autoescape(['html', 'xml'])
-)
+from python_test.utils.soap_builder import envelopes
 
 
 def current_user_xml(username: str) -> str:
-    template = env.get_template('resources/templates/xml/current_user.xml')
-    return template.render({'username': username})
+    return envelopes.render('current_user', {'username': username})
 
 
 def update_user_xml(uuid: str, username: str, firstname: str = '', surname: str = '', fullname: str = '',
                     currency: str = '', photo: str = '', photo_small: str = '', friendship_status: str = '') -> str:
-    template = env.get_template('resources/templates/xml/update_user.xml')
-    return template.render({'uuid': uuid,
-                            'username': username,
-                            'firstname': firstname,
-                            'surname': surname,
-                            'fullname': fullname,
-                            'currency': currency,
-                            'photo': photo,
-                            'photo_small': photo_small,
-                            'friendship_status': friendship_status
-                            })
+    return envelopes.render('update_user', {'uuid': uuid,
+                                            'username': username,
+                                            'firstname': firstname,
+                                            'surname': surname,
+                                            'fullname': fullname,
+                                            'currency': currency,
+                                            'photo': photo,
+                                            'photo_small': photo_small,
+                                            'friendship_status': friendship_status
+                                            })
 
 
 def send_invitation_xml(username: str, to_username: str):
-    template = env.get_template('resources/templates/xml/send_invitation.xml')
-    return template.render({'from': username, 'to': to_username})
+    return envelopes.render('send_invitation', {'from': username, 'to': to_username})
 
 
 def accept_invitation_xml(username: str, friend: str):
-    template = env.get_template('resources/templates/xml/accept_invitation.xml')
-    return template.render({'username': username, 'friend': friend})
+    return envelopes.render('accept_invitation', {'username': username, 'friend': friend})
 
 
 def decline_invitation_xml(username: str, friend: str):
-    template = env.get_template('resources/templates/xml/decline_invitation.xml')
-    return template.render({'username': username, 'friend': friend})
+    return envelopes.render('decline_invitation', {'username': username, 'friend': friend})
 
 
 def friends(username: str, query: str = ''):
-    template = env.get_template('resources/templates/xml/friends.xml')
-    return template.render({'username': username, 'query': query})
+    return envelopes.render('friends', {'username': username, 'query': query})
 
 
 def remove_friend(username: str, friend: str):
-    template = env.get_template('resources/templates/xml/remove_friend.xml')
-    return template.render({'username': username, 'friend': friend})
+    return envelopes.render('remove_friend', {'username': username, 'friend': friend})
+
+
+def send_invitations_xml(pairs: Iterable[tuple[str, str]]) -> Iterator[str]:
+    """Конверты sendInvitation для пар (от кого, кому)"""
+    return envelopes.render_many('send_invitation', ({'from': username, 'to': to} for username, to in pairs))
+
+
+def accept_invitations_xml(pairs: Iterable[tuple[str, str]]) -> Iterator[str]:
+    """Конверты acceptInvitation для пар (кто принимает, от кого)"""
+    return envelopes.render_many('accept_invitation',
+                                 ({'username': username, 'friend': friend} for username, friend in pairs))
+
+
+def friends_many(usernames: Iterable[str], query: str = '') -> Iterator[str]:
+    return envelopes.render_many('friends', ({'username': username, 'query': query} for username in usernames))
@@ -1,14 +1,12 @@
-import time
 from datetime import datetime, timezone
 from http import HTTPStatus
 
 import allure
 import pytest
 from faker import Faker
-from filelock import FileLock
 from requests import HTTPError
 
-from python_test.data_helper.api_helper import SpendsHttpClient
+from python_test.data_helper.api_helper import CURRENCIES, AsyncSpendsHttpClient, SpendsHttpClient
 from python_test.databases.spend_db import SpendDb
 from python_test.fixtures.auth_fixtures import auth_token
 from python_test.marks import TestData
@@ -16,33 +14,19 @@ from python_test.model.config import Envs
 from python_test.model.db.category import Category
 from python_test.model.db.spend import SpendAdd
 from python_test.report_helper import Epic, Feature, Story
+from python_test.utils.waiters import async_wait_for
 
 
 @pytest.fixture(scope="module", autouse=True)
-def module_fixture(tmp_path_factory, worker_id, spends_client: SpendsHttpClient, spend_db: SpendDb):
-    def _prepare_state():
-        categories_ids = spends_client.get_ids_all_categories()
-        spend_db.delete_categories_by_ids(categories_ids)
-        all_spends_ids = spends_client.get_ids_all_spending()
-        for spend_id in all_spends_ids:
-            spends_client.delete_spending_by_id(spend_id)
-
-    if worker_id == "master":
-        _prepare_state()
-
-    root_tmp_dir = tmp_path_factory.getbasetemp().parent
-
-    fn = root_tmp_dir / "prepare"
-    with FileLock(str(fn) + ".lock"):
-        if fn.is_file():
-            pass
-        else:
-            _prepare_state()
-
-
-@pytest.fixture(scope='function', autouse=True)
-def wait_before_run_test():
-    time.sleep(1)  # Ожидание для отработки фикстуры модуля при параллельном запуске
+def module_fixture(spends_client: SpendsHttpClient, spend_db: SpendDb):
+    """Удалить категории (вместе с тратами), созданные тестами модуля, в том числе без фикстур.
+    Данные, которые были у пользователя до модуля, не трогаются. У каждого воркера xdist свой пользователь,
+    поэтому блокировки не нужны."""
+    existing = {category.id for category in spend_db.get_user_categories(spends_client.user_name)}
+    yield
+    created = [category.id for category in spend_db.get_user_categories(spends_client.user_name)
+               if category.id not in existing]
+    spend_db.delete_categories_by_ids(created)
 
 
 def get_spend_model(envs: Envs, category_name: str = '') -> dict:
@@ -92,6 +76,51 @@ class TestApi:
                 assert current_spend.currency == spend.currency
                 assert current_spend.description == spend.description
 
+        @pytest.mark.asyncio(loop_scope='session')
+        @TestData.spends([
+            {'category': 'test_bulk', 'amount': amount, 'currency': CURRENCIES[amount % len(CURRENCIES)],
+             'desc': f'bulk {amount}'}
+            for amount in range(1, 31)
+        ])
+        @allure.title('Параллельное создание и удаление пачки трат')
+        async def test_spends_bulk(self, async_spends_client: AsyncSpendsHttpClient, spends: list[SpendAdd]):
+            ids = [spend.id for spend in spends]
+
+            with allure.step('Проверить, что все траты созданы и есть в списке трат пользователя'):
+                assert len(set(ids)) == 30
+                assert set(ids) <= set(await async_spends_client.get_ids_all_spending())
+
+            with allure.step('Проверить данные созданных трат'):
+                current = await async_spends_client.gather(*(async_spends_client.get_spend_by_id(i) for i in ids))
+                assert [(spend.amount, spend.currency) for spend in current] == \
+                       [(spend.amount, spend.currency) for spend in spends]
+
+            with allure.step('Удалить траты пачками и проверить, что их больше нет'):
+                await async_spends_client.delete_spends_bulk(ids, chunk_size=7)
+                await async_wait_for(async_spends_client.get_ids_all_spending, timeout=5,
+                                     condition=lambda current: not set(ids) & set(current),
+                                     raise_on_timeout=True, name='удаления трат')
+
+        @allure.title('Создание и удаление пачки трат батчами синхронным клиентом')
+        def test_spends_bulk_sync(self, spends_client: SpendsHttpClient):
+            spends = [{'category': 'test_bulk_sync', 'amount': amount, 'currency': CURRENCIES[amount % len(CURRENCIES)]}
+                      for amount in range(1, 16)]
+            created = spends_client.add_spends_bulk(spends, chunk_size=4)
+            ids = [spend.id for spend in created]
+
+            with allure.step('Проверить, что все траты созданы в порядке запроса'):
+                assert len(set(ids)) == len(spends)
+                assert [(spend.amount, spend.currency) for spend in created] == \
+                       [(spend['amount'], spend['currency']) for spend in spends]
+                assert set(ids) <= set(spends_client.get_ids_all_spending())
+
+            with allure.step('Удалить траты батчами и проверить, что их больше нет'):
+                assert spends_client.delete_spends_bulk(ids, chunk_size=4) == len(ids)
+                assert not set(ids) & set(spends_client.get_ids_all_spending())
+
+            with allure.step('Проверить, что задержки батчей собраны'):
+                assert spends_client.batch_latencies.count >= 8
+
         @TestData.category({'category_name': 'test_amount_required', 'archived': False})
         @allure.title('Обязательность наличия суммы траты')
         def test_required_amount_for_spend(self, envs: Envs, auth_token, category):
@@ -3,13 +3,12 @@ from typing import Any, Generator
 import allure
 import pytest
 from faker import Faker
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 
 from python_test.model.LoginPage import LoginPage
 from python_test.model.config import Envs
 from python_test.model.niffler import Niffler
 from python_test.report_helper import Epic, Feature, Story
+from python_test.utils.browser_pool import BrowserPool
 
 fake = Faker()
 
@@ -20,15 +19,10 @@ pytestmark = [pytest.mark.allure_label(Epic.niffler, label_type="epic"), pytest.
 class TestPositiveScenario:
 
     @pytest.fixture(scope="function")
-    def browser(self) -> Generator[Niffler, Any, None]:
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--incognito")
-        options.add_argument("--disable-dev-shm-usage")
-        wd = webdriver.Chrome(options=options)
-        niffler = Niffler(wd)
-        yield niffler
-        wd.quit()
+    def browser(self, browser_pool: BrowserPool) -> Generator[Niffler, Any, None]:
+        wd = browser_pool.acquire()
+        yield Niffler(wd)
+        browser_pool.release(wd)
 
     @allure.feature(Feature.log_in)
     @allure.title('Авторизация под существующим пользователем')
@@ -60,16 +54,10 @@ class TestPositiveScenario:
 class TestNegativeScenario:
 
     @pytest.fixture(scope="class")
-    def browser(self) -> Generator[Niffler, Any, None]:
-        options = Options()
-        options.add_argument("--lang=en")
-        options.add_argument("--headless")
-        options.add_argument("--incognito")
-        options.add_argument("--disable-dev-shm-usage")
-        wd = webdriver.Chrome(options=options)
-        niffler = Niffler(wd)
-        yield niffler
-        wd.quit()
+    def browser(self, browser_pool: BrowserPool) -> Generator[Niffler, Any, None]:
+        wd = browser_pool.acquire("--lang=en")
+        yield Niffler(wd)
+        browser_pool.release(wd)
 
     @allure.feature(Feature.log_in)
     @allure.title('Авторизация под не существующим пользователем')
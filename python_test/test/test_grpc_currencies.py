@@ -1,8 +1,12 @@
+import json
+import time
+
 import allure
 import grpc
 import pytest
 from google.protobuf import empty_pb2
 
+from python_test.internal.grpc.currency import AsyncCurrencyClient
 from python_test.internal.pb.niffler_currency_pb2 import CalculateRequest, CurrencyValues
 from python_test.internal.pb.niffler_currency_pb2_pbreflect import NifflerCurrencyServiceClient
 from python_test.report_helper import Feature, Epic
@@ -90,3 +94,31 @@ class TestGrpcCurrencies:
             response = grpc_client.get_all_currencies(empty_pb2.Empty())
         with allure.step('Убедиться, что общее количество типов валют равно 4'):
             assert len(response.allCurrencies) == 4
+
+
+@pytest.mark.perf
+@allure.epic(Epic.niffler)
+@allure.feature(Feature.grpc)
+class TestGrpcCurrencyThroughput:
+
+    @pytest.mark.asyncio(loop_scope='session')
+    @pytest.mark.parametrize('count', (5000,))
+    @allure.title('Замер пропускной способности конвертации валют сервисом niffler-currency')
+    async def test_calculate_rate_throughput(self, async_grpc_perf_client: AsyncCurrencyClient, count: int):
+        with allure.step('Получить курсы валют'):
+            currencies = await async_grpc_perf_client.get_all_currencies(empty_pb2.Empty())
+            rates = {currency.currency: currency.currencyRate for currency in currencies.allCurrencies}
+            expected = 100.0 * rates[CurrencyValues.USD] / rates[CurrencyValues.RUB]
+
+        requests = [CalculateRequest(spendCurrency=CurrencyValues.USD, desiredCurrency=CurrencyValues.RUB,
+                                     amount=100.0) for _ in range(count)]
+        with allure.step(f'Отправить {count} запросов на конвертацию конкурентно'):
+            started = time.perf_counter()
+            responses = await async_grpc_perf_client.calculate_rate_many(requests)
+            elapsed = time.perf_counter() - started
+        allure.attach(json.dumps({'count': count, 'elapsed_s': round(elapsed, 3), 'rps': round(count / elapsed)}),
+                      'throughput', attachment_type=allure.attachment_type.JSON)
+
+        with allure.step('Убедиться, что все запросы обработаны корректно'):
+            # сервис округляет сумму до копеек
+            assert all(response.calculatedAmount == pytest.approx(expected, abs=0.01) for response in responses)
@@ -7,6 +7,7 @@ from faker import Faker
 
 from python_test.data_helper.api_helper import UserApiHelper
 from python_test.data_helper.kafka_client import KafkaClient
+from python_test.data_helper.kafka_probe import UserdataIngestionProbe
 from python_test.databases.usertdata_db import UserdataDb
 from python_test.model.config import Envs
 from python_test.model.db.user import UserName
@@ -23,14 +24,15 @@ class TestKafka:
         username = Faker().user_name()
         password = Faker().password(special_chars=False)
 
-        topic_partitions = kafka.subscribe_listen_new_offsets('users')
+        kafka.listen('users', index_field='username')
 
         with allure.step('Зарегистрировать нового пользователя'):
             auth_client = UserApiHelper(envs)
             result = auth_client.create_user(username, password)
             assert result.status_code == 201
 
-        event = kafka.log_msg_and_json(topic_partitions)
+        event = kafka.await_message('users', value=username, timeout=25).value
+        logging.info(event)
 
         with allure.step("Проверить, что сообщение из Kafka существует"):
             assert event != '' and event != b''
@@ -49,3 +51,18 @@ class TestKafka:
         with allure.step('Убедиться, что в таблице userdata есть запись о пользователе из сообщения'):
             user_from_db = userdata_db.get_user(username=user_name_for_msg)
             assert user_from_db.username == user_name_for_msg
+
+
+@pytest.mark.perf
+@allure.epic(Epic.niffler)
+@allure.feature(Feature.kafka)
+class TestKafkaIngestion:
+
+    @pytest.mark.parametrize('count', (500,))
+    @allure.title('Замер задержки и скорости обработки сообщений из Kafka сервисом niffler-userdata')
+    def test_userdata_ingestion_latency(self, kafka: KafkaClient, userdata_db: UserdataDb, count: int):
+        report = UserdataIngestionProbe(kafka, userdata_db).run(count)
+
+        with allure.step('Убедиться, что все отправленные сообщения доставлены и обработаны'):
+            assert report.produce.failed == 0, 'Есть ошибки при отправке в Kafka'
+            assert report.missing == 0, f'В БД userdata не появилось {report.missing} пользователей'
@@ -1,14 +1,18 @@
+import json
+
 import allure
 import pytest
 from faker import Faker
 
 from python_test.data_helper.api_helper import UserApiHelper
+from python_test.data_helper.friendship_graph import GraphLoader, LoadedGraph, friends_benchmark, generate_graph
 from python_test.report_helper import Epic, Feature
 from python_test.resources.templates.read_templates import (current_user_xml, update_user_xml, send_invitation_xml,
                                                             accept_invitation_xml, decline_invitation_xml, friends,
-                                                            remove_friend)
+                                                            remove_friend, send_invitations_xml, accept_invitations_xml,
+                                                            friends_many)
 from python_test.utils.sessions import SoapSession
-from python_test.utils.xml_check import check_current_user_result_operation, get_friends_list
+from python_test.utils.xml_check import decode_user, decode_users
 
 fake = Faker()
 
@@ -25,6 +29,14 @@ def auth_helper(envs):
     result = auth_client.create_user(fake.name(), fake.password(special_chars=False))
     return result
 
+
+@pytest.fixture()
+def friendship_graph(userdata_db) -> LoadedGraph:
+    loader = GraphLoader(userdata_db)
+    loaded = loader.load_db(generate_graph(300, mean_degree=6, seed=7))
+    yield loaded
+    loader.unload(loaded)
+
 @pytest.mark.parallel
 @allure.epic(Epic.niffler)
 @allure.feature(Feature.soap)
@@ -36,10 +48,10 @@ class TestSoapNiffler:
             response = soap_session.request(data=current_user_xml(envs.test_username))
 
         with allure.step('Проверить корректность ответа'):
-            user_data = check_current_user_result_operation(response.text)
-            assert user_data['username'] == envs.test_username
+            user = decode_user(response.content)
+            assert user.username == envs.test_username
             with allure.step('Убедиться, что у пользователя есть id'):
-                assert user_data['id'], 'У пользователя нет id'
+                assert user.id, 'У пользователя нет id'
 
     @allure.title('Запрос информации о незарегистрированном пользователе в системе по username')
     def test_get_user_info_by_not_exist_username(self, soap_session):
@@ -48,12 +60,12 @@ class TestSoapNiffler:
             response = soap_session.request(data=current_user_xml(user_name))
 
         with allure.step('Проверить ответ'):
-            user_data = check_current_user_result_operation(response.text)
-            assert user_data['username'] == user_name
+            user = decode_user(response.content)
+            assert user.username == user_name
             with allure.step('Убедиться, что у пользователя в ответе отсутствует поле id'):
-                assert not user_data['id'], 'У пользователя есть id'
+                assert not user.id, 'У пользователя есть id'
             with allure.step('Убедиться, что у пользователя в ответе отсутствует поле fullname'):
-                assert not user_data['fullname'], 'У пользователя есть поле fullname'
+                assert not user.fullname, 'У пользователя есть поле fullname'
 
     @allure.title('Обновление полного имени и типа валюты у пользователя')
     def test_update_user(self, soap_session, envs, auth_helper, userdata_db):
@@ -75,29 +87,23 @@ class TestSoapNiffler:
             assert update_user.currency == new_currency, 'Значение типа валюты не обновилось'
 
     @allure.title('Отправка запроса на дружбу')
-    def test_send_invitation(self, soap_session, envs, userdata_db):
-        user_1, user_2 = fake.name(), fake.name()
-        with allure.step(f'Создать пользователей {user_1} и {user_2} в системе'):
-            UserApiHelper(envs).create_user(user_1, fake.password(special_chars=False))
-            UserApiHelper(envs).create_user(user_2, fake.password(special_chars=False))
-            user_1_from_db = userdata_db.get_user(user_1)
-            user_2_from_db = userdata_db.get_user(user_2)
+    def test_send_invitation(self, soap_session, new_users, userdata_db):
+        with allure.step('Взять двух новых пользователей'):
+            user_1_from_db, user_2_from_db = new_users(2)
+            user_1, user_2 = user_1_from_db.username, user_2_from_db.username
 
         with allure.step(f'Отправить запрос на дружбу от {user_1} к {user_2}'):
             soap_session.request(data=send_invitation_xml(user_1, user_2))
 
         with allure.step('Убедиться, что статус приглашения в БД == PENDING'):
-            friendship = userdata_db.get_friendship(user_1_from_db.id.__str__(), user_2_from_db.id.__str__())
+            friendship = userdata_db.get_friendship(user_1_from_db.id, user_2_from_db.id)
             assert friendship.status == 'PENDING', 'Статус != "PENDING"'
 
     @allure.title('Принятие запроса на дружбу')
-    def test_accept_invitation(self, soap_session, envs, userdata_db):
-        user_1, user_2 = fake.name(), fake.name()
-        with allure.step(f'Создать пользователей {user_1} и {user_2} в системе'):
-            UserApiHelper(envs).create_user(user_1, fake.password(special_chars=False))
-            UserApiHelper(envs).create_user(user_2, fake.password(special_chars=False))
-            user_1_from_db = userdata_db.get_user(user_1)
-            user_2_from_db = userdata_db.get_user(user_2)
+    def test_accept_invitation(self, soap_session, new_users, userdata_db):
+        with allure.step('Взять двух новых пользователей'):
+            user_1_from_db, user_2_from_db = new_users(2)
+            user_1, user_2 = user_1_from_db.username, user_2_from_db.username
 
         with allure.step(f'Отправить запрос на дружбу от {user_1} к {user_2}'):
             soap_session.request(data=send_invitation_xml(user_1, user_2))
@@ -106,39 +112,33 @@ class TestSoapNiffler:
             soap_session.request(data=accept_invitation_xml(user_2, friend=user_1))
 
         with allure.step('Убедиться, что статус приглашения в БД == ACCEPTED'):
-            friendship = userdata_db.get_friendship(user_1_from_db.id.__str__(), user_2_from_db.id.__str__())
+            friendship = userdata_db.get_friendship(user_1_from_db.id, user_2_from_db.id)
             assert friendship.status == 'ACCEPTED', 'Статус != "ACCEPTED"'
 
     @allure.title('Отклонение запроса на дружбу')
-    def test_decline_invitation(self, soap_session, envs, userdata_db):
-        user_1, user_2 = fake.name(), fake.name()
-        with allure.step(f'Создать пользователей {user_1} и {user_2} в системе'):
-            UserApiHelper(envs).create_user(user_1, fake.password(special_chars=False))
-            UserApiHelper(envs).create_user(user_2, fake.password(special_chars=False))
-            user_1_from_db = userdata_db.get_user(user_1)
-            user_2_from_db = userdata_db.get_user(user_2)
+    def test_decline_invitation(self, soap_session, new_users, userdata_db):
+        with allure.step('Взять двух новых пользователей'):
+            user_1_from_db, user_2_from_db = new_users(2)
+            user_1, user_2 = user_1_from_db.username, user_2_from_db.username
 
         with allure.step(f'Отправить запрос на дружбу от {user_1} к {user_2}'):
             soap_session.request(data=send_invitation_xml(user_1, user_2))
 
         with allure.step('Убедиться, что статус приглашения в БД == PENDING'):
-            friendship = userdata_db.get_friendship(user_1_from_db.id.__str__(), user_2_from_db.id.__str__())
+            friendship = userdata_db.get_friendship(user_1_from_db.id, user_2_from_db.id)
             assert friendship.status == 'PENDING', 'Статус != "PENDING"'
 
         with allure.step(f'Отклонить запрос на дружбу пользователем {user_2} от {user_1}'):
             soap_session.request(data=decline_invitation_xml(user_2, friend=user_1))
 
         with allure.step('Убедиться в отсутствии записи о дружбе в БД'):
-            friendship = userdata_db.get_friendship(user_1_from_db.id.__str__(), user_2_from_db.id.__str__())
+            friendship = userdata_db.get_friendship(user_1_from_db.id, user_2_from_db.id)
             assert not friendship, 'Есть запись о дружбе в БД'
 
     @allure.title('Получение списка друзей')
-    def test_get_friends(self, soap_session, envs):
-        user_1, user_2, user_3 = fake.name(), fake.name(), fake.name()
-        with allure.step(f'Создать пользователей {user_1} и {user_2} в системе'):
-            UserApiHelper(envs).create_user(user_1, fake.password(special_chars=False))
-            UserApiHelper(envs).create_user(user_2, fake.password(special_chars=False))
-            UserApiHelper(envs).create_user(user_3, fake.password(special_chars=False))
+    def test_get_friends(self, soap_session, new_users):
+        with allure.step('Взять трех новых пользователей'):
+            user_1, user_2, user_3 = (user.username for user in new_users(3))
 
         with allure.step(f'Отправить запрос на дружбу от {user_1} к {user_2} и {user_3}'):
             soap_session.request(data=send_invitation_xml(user_1, user_2))
@@ -150,16 +150,14 @@ class TestSoapNiffler:
 
         with allure.step(f'Убедиться в наличии 2-ух друзей у пользователя {user_1}'):
             response = soap_session.request(data=friends(user_1))
-            friends_list = get_friends_list(response.text)
-            assert all(user['username'] in (user_2, user_3) for user in friends_list), 'Не все юзеры в списке друзей'
-            assert all(user['friendshipStatus'] == 'FRIEND' for user in friends_list), 'Нет статуса Friend'
+            friends_list = decode_users(response.content).users
+            assert all(user.username in (user_2, user_3) for user in friends_list), 'Не все юзеры в списке друзей'
+            assert all(user.friendship_status == 'FRIEND' for user in friends_list), 'Нет статуса Friend'
 
     @allure.title('Удаление друга')
-    def test_remove_friend(self, soap_session, envs):
-        user_1, user_2 = fake.name(), fake.name()
-        with allure.step(f'Создать пользователей {user_1} и {user_2} в системе'):
-            UserApiHelper(envs).create_user(user_1, fake.password(special_chars=False))
-            UserApiHelper(envs).create_user(user_2, fake.password(special_chars=False))
+    def test_remove_friend(self, soap_session, new_users):
+        with allure.step('Взять двух новых пользователей'):
+            user_1, user_2 = (user.username for user in new_users(2))
 
         with allure.step(f'Отправить запрос на дружбу от {user_1} к {user_2}'):
             soap_session.request(data=send_invitation_xml(user_1, user_2))
@@ -169,15 +167,63 @@ class TestSoapNiffler:
 
         with allure.step(f'Убедиться в наличии друга у пользователя {user_1}'):
             response = soap_session.request(data=friends(user_1))
-            friends_list = get_friends_list(response.text)
+            friends_list = decode_users(response.content).users
             assert len(friends_list) == 1
             friend = friends_list[0]
-            assert friend['username'] == user_2
-            assert friend['friendshipStatus'] == 'FRIEND'
+            assert friend.username == user_2
+            assert friend.friendship_status == 'FRIEND'
 
         with allure.step('Удалить друга'):
             soap_session.request(data=remove_friend(username=user_1, friend=user_2))
 
         with allure.step(f'Убедиться, что список друзей пуст после удаления друга'):
             response = soap_session.request(data=friends(user_1))
-            assert not get_friends_list(response.text)
+            assert not decode_users(response.content).users
+
+
+@pytest.mark.perf
+@allure.epic(Epic.niffler)
+@allure.feature(Feature.soap)
+class TestSoapFriendshipStress:
+
+    @pytest.mark.parametrize('pairs, concurrency', [(100, 20)])
+    @allure.title('Нагрузка на SOAP niffler-userdata операциями дружбы')
+    def test_friendship_operations_under_load(self, envs, new_users, userdata_db, pairs: int, concurrency: int):
+        with allure.step(f'Взять {pairs * 2} новых пользователей'):
+            users = new_users(pairs * 2)
+            usernames = [user.username for user in users]
+            requesters, addressees = usernames[:pairs], usernames[pairs:]
+
+        session = SoapSession(base_url=envs.soap_address, pool_size=concurrency)
+        responses = session.send_many(send_invitations_xml(zip(requesters, addressees, strict=True)))
+        responses += session.send_many(accept_invitations_xml(zip(addressees, requesters, strict=True)))
+        responses += session.send_many(friends_many(requesters))
+
+        with allure.step('Убедиться, что у каждого пользователя появился друг'):
+            friends_lists = [decode_users(response.content).users for response in responses[-pairs:]]
+            assert all([friend.username for friend in friends] == [addressee]
+                       for friends, addressee in zip(friends_lists, addressees, strict=True))
+        with allure.step('Убедиться, что в БД все дружбы приняты в обе стороны'):
+            ids = [str(user.id) for user in users]
+            friendships = userdata_db.get_friendship_map(usernames)
+            assert all(friendships.get(ids[i], {}).get(ids[pairs + i]) == 'ACCEPTED'
+                       and friendships.get(ids[pairs + i], {}).get(ids[i]) == 'ACCEPTED' for i in range(pairs))
+        with allure.step('Убедиться, что задержки собраны по каждой операции'):
+            report = session.latency_report()
+            assert all(report[operation]['count'] == pairs
+                       for operation in ('sendInvitationRequest', 'acceptInvitationRequest', 'friendsRequest'))
+
+    @allure.title('Задержка запроса friends в зависимости от числа друзей')
+    def test_friends_latency_by_friend_count(self, soap_session, userdata_db, friendship_graph):
+        rows = friends_benchmark(soap_session, friendship_graph, queries=('',), samples=3, repeats=2, seed=7)
+        allure.attach(json.dumps(rows, indent=2), 'friends latency', attachment_type=allure.attachment_type.JSON)
+
+        with allure.step('Убедиться, что friends возвращает каждому пользователю всех его друзей из графа'):
+            wrong_counts = {username: counts for row in rows for username, counts in row['wrong_counts'].items()}
+            assert not wrong_counts, f'Друзей в графе и в ответе friends: {wrong_counts}'
+        with allure.step('Убедиться, что в БД есть все дружбы графа'):
+            friendships = userdata_db.get_friendship_map(friendship_graph.usernames)
+            ids = friendship_graph.ids
+            assert all(ids[addressee] in friendships.get(ids[requester], {})
+                       for requester, addressee in friendship_graph.graph.edges)
+            assert sum(map(len, friendships.values())) == 2 * len(friendship_graph.graph.edges)
@@ -1,6 +1,10 @@
+import contextvars
+import functools
 import json
 import logging
+import shlex
 from json import JSONDecodeError
+from typing import Callable, Iterable
 
 import allure
 import curlify
@@ -8,70 +12,164 @@ from allure_commons.types import AttachmentType
 from requests import Response
 from requests.structures import CaseInsensitiveDict
 
+from python_test.utils.attachments import attachments
+from python_test.utils.templates import templates
+from python_test.utils.timings import call_timings, normalize_path
+
+
+def _json_chunks(response) -> Iterable[str]:
+    """Отформатированный json ответа кусками, для невалидного json - исходный текст"""
+    try:
+        data = response.json()
+    except JSONDecodeError:
+        return [response.text]
+    return json.JSONEncoder(indent=4).iterencode(data)
+
+
+def _attach_exchange(request, make_curl: Callable[[], str], response):
+    """Вложить в allure отрисованный запрос, тело и хедеры ответа.
+    response - ответ requests или httpx, оба поддерживают json(), text, status_code, headers.
+    Тела вложений формируются лениво, только если политика вложений их записывает."""
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(make_curl())
+        logging.debug(response.text)
+
+    attachments.attach(
+        lambda: templates.get("http-colored-request.ftl").render({"request": request, "curl": make_curl()}),
+        name="Request",
+        attachment_type=AttachmentType.HTML
+    )
+    if 'json' in response.headers.get('Content-Type', ''):
+        attachments.attach(
+            lambda: _json_chunks(response),
+            name=f"Response json {response.status_code}",
+            attachment_type=AttachmentType.JSON
+        )
+    else:
+        attachments.attach(
+            lambda: response.text,
+            name=f"Response text {response.status_code}",
+            attachment_type=AttachmentType.TEXT
+        )
+    attachments.attach(
+        lambda: json.dumps(dict(response.headers), indent=4),
+        name=f"Response headers {response.status_code}",
+        attachment_type=AttachmentType.JSON
+    )
+
 
 def allure_attach_request(function):
     """Декоратор логирования запроса, хедеров запроса, хедеров ответа в allure шаг и аллюр аттачмент и в консоль."""
 
     def wrapper(*args, **kwargs):
         method, url = args[1], args[2]
-
-        from jinja2 import Environment, PackageLoader, select_autoescape
-        env = Environment(
-            loader=PackageLoader("resources"),
-            autoescape=select_autoescape()
-        )
-        template = env.get_template("http-colored-request.ftl")
-
         with allure.step(f"{method} {url}"):
-
             response: Response = function(*args, **kwargs)
-            curl = curlify.to_curl(response.request)
-
-            prepare_render = {
-                "request": response.request,
-                "curl": curl,
-            }
-            render = template.render(prepare_render)
-
-            logging.debug(curl)
-            logging.debug(response.text)
-
-            allure.attach(
-                body=render,
-                name=f"Request",
-                attachment_type=AttachmentType.HTML,
-                extension=".html"
-            )
-
-            try:
-                allure.attach(
-                    body=json.dumps(response.json(), indent=4).encode("utf8"),
-                    name=f"Response json {response.status_code}",
-                    attachment_type=AttachmentType.JSON,
-                    extension=".json"
-                )
-            except JSONDecodeError:
-                allure.attach(
-                    body=response.text.encode("utf8"),
-                    name=f"Response text {response.status_code}",
-                    attachment_type=AttachmentType.TEXT,
-                    extension=".txt")
-            headers_dict = dict(response.headers)
-            allure.attach(
-                body=json.dumps(headers_dict, indent=4).encode("utf8"),
-                name=f"Response headers {response.status_code}",
-                attachment_type=AttachmentType.JSON,
-                extension=".json"
-            )
+            call_timings.record('http', f'{method} {normalize_path(url)}', response.elapsed.total_seconds())
+            _attach_exchange(response.request, lambda: curlify.to_curl(response.request), response)
             return response
 
     return wrapper
 
 
-def attach_sql(statement, parameters, context):
-    statement_with_params = statement % parameters
-    name = statement.split(" ")[0] + " " + context.engine.url.database
-    allure.attach(statement_with_params, name=name, attachment_type=AttachmentType.TEXT)
+def httpx_to_curl(request) -> str:
+    """Сформировать curl по запросу httpx в формате curlify"""
+    parts = ['curl', '-X', request.method]
+    for key, value in request.headers.items():
+        parts += ['-H', f'{key}: {value}']
+    if request.content:
+        parts += ['-d', request.content.decode('utf8', errors='replace')]
+    parts.append(str(request.url))
+    return ' '.join(shlex.quote(part) for part in parts)
+
+
+# Стек шагов allure один на поток, поэтому шаг нельзя держать открытым через await:
+# параллельные корутины вложат шаги друг в друга. Асинхронный код записывает шаги после await,
+# а вложенные шаги копит в списке своей задачи и воспроизводит внутри родительского шага.
+_deferred_steps: contextvars.ContextVar[list[Callable[[], None]] | None] = contextvars.ContextVar(
+    'deferred_allure_steps', default=None)
+
+
+def _record_step(replay: Callable[[], None]):
+    """Записать шаг сразу или отложить до закрытия внешнего async_step"""
+    pending = _deferred_steps.get()
+    if pending is None:
+        replay()
+    else:
+        pending.append(replay)
+
+
+def _replay_step(title: str, children: list[Callable[[], None]], error: BaseException | None = None):
+    step = allure.step(title)
+    step.__enter__()
+    for child in children:
+        child()
+    if error is None:
+        step.__exit__(None, None, None)
+    else:
+        step.__exit__(type(error), error, error.__traceback__)
+
+
+async def in_async_step(title: str, coroutine):
+    """Выполнить корутину как шаг allure. Шаг записывается после ее завершения вместе с вложенными шагами,
+    время шага в отчете - время записи."""
+    children = []
+    token = _deferred_steps.set(children)
+    try:
+        result = await coroutine
+    except Exception as error:
+        _deferred_steps.reset(token)
+        _record_step(functools.partial(_replay_step, title, children, error))
+        raise
+    _deferred_steps.reset(token)
+    _record_step(functools.partial(_replay_step, title, children))
+    return result
+
+
+def async_step(title: str):
+    """Аналог allure.step для async def, см. in_async_step"""
+
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            return await in_async_step(title, function(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def allure_attach_async_request(function):
+    """Асинхронный аналог allure_attach_request для сессий на httpx. Шаг записывается после получения ответа."""
+
+    async def wrapper(*args, **kwargs):
+        method, url = args[1], args[2]
+        response = await function(*args, **kwargs)
+        call_timings.record('http', f'{method} {normalize_path(url)}', response.elapsed.total_seconds())
+        request = response.request
+        render_request = {
+            "method": request.method,
+            "url": str(request.url),
+            "body": request.content.decode('utf8', errors='replace'),
+            "headers": dict(request.headers),
+        }
+
+        def replay():
+            with allure.step(f"{method} {url}"):
+                _attach_exchange(render_request, lambda: httpx_to_curl(request), response)
+
+        _record_step(replay)
+        return response
+
+    return wrapper
+
+
+def _attachment_type(content_type: str) -> AttachmentType:
+    if 'json' in content_type:
+        return AttachmentType.JSON
+    if 'xml' in content_type:
+        return AttachmentType.XML
+    return AttachmentType.TEXT
 
 
 def allure_request_logger(function):
@@ -79,11 +177,18 @@ def allure_request_logger(function):
         response: Response = function(*args, **kwargs)
         method = response.request.method
         url = response.request.url
-        logging.info(f'\n\nREQUEST {method} {url}\n\n'
-                     f'REQUEST HEADERS {prettyfy_headers(response.request.headers)}\n\n'
-                     f'REQUEST BODY {prettyfy_body(response.request.body)}\n\n'
-                     f'RESPONSE HEADERS {prettyfy_headers(response.headers)}\n\n'
-                     f'RESPONSE BODY {prettyfy_body(response.content)}\n\n')
+        request_type = response.request.headers.get('Content-Type', '')
+        response_type = response.headers.get('Content-Type', '')
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info(f'\n\nREQUEST {method} {url}\n\n'
+                         f'REQUEST HEADERS {prettyfy_headers(response.request.headers)}\n\n'
+                         f'REQUEST BODY {prettyfy_body(response.request.body, request_type)}\n\n'
+                         f'RESPONSE HEADERS {prettyfy_headers(response.headers)}\n\n'
+                         f'RESPONSE BODY {prettyfy_body(response.content, response_type)}\n\n')
+        attachments.attach(lambda: response.request.body or '', name=f"Request {method}",
+                           attachment_type=_attachment_type(request_type))
+        attachments.attach(lambda: response.content, name=f"Response {response.status_code}",
+                           attachment_type=_attachment_type(response_type))
         return response
 
     return wrapper
@@ -96,14 +201,18 @@ def prettyfy_headers(headers: CaseInsensitiveDict) -> str:
         return 'None'
 
 
-def prettyfy_body(body: bytes) -> str:
-    if body:
+def prettyfy_body(body: bytes | str | None, content_type: str = '') -> str:
+    """Тело для лога: json форматируется, остальное (XML SOAP, текст) выводится как есть"""
+    if not body:
+        return 'None'
+    if isinstance(body, bytes):
+        body = body.decode('utf8', errors='replace')
+    if 'json' in content_type:
         try:
             return json_dumping(json.loads(body))
-        except:
-            return str(body)
-    else:
-        return 'None'
+        except ValueError:
+            pass
+    return body
 
 
 def json_dumping(dict_to_convert: dict) -> str:
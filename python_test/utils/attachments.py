@@ -0,0 +1,121 @@
+import logging
+import random
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable, Iterable, Literal
+
+from allure_commons.model2 import ATTACHMENT_PATTERN, Attachment, ExecutableItem
+from allure_commons.types import AttachmentType
+
+# Тело вложения: готовая строка/байты, либо функция, которая строит тело (строкой, байтами или кусками).
+# Функция вызывается только если вложение действительно пишется в отчет.
+Body = str | bytes | Callable[[], str | bytes | Iterable[str | bytes]]
+
+Mode = Literal['all', 'failed', 'sampled']
+
+TRUNCATED_NOTE = '\n\n... обрезано, полный размер превышает {limit} KB'
+
+
+class AttachmentPolicy:
+    """Политика записи allure вложений для HTTP, SOAP, gRPC и SQL.
+
+    mode:
+        all - писать все вложения сразу;
+        failed - копить вложения теста и писать только если тест упал;
+        sampled - как failed, но для успешных тестов писать вложения с вероятностью sample_rate.
+    max_size_kb - обрезать вложения больше заданного размера, 0 - без ограничений.
+    Вложения пишутся напрямую в каталог --alluredir по кускам, без сборки всего тела в памяти.
+    Без --alluredir вложения не формируются вовсе.
+    """
+
+    def __init__(self):
+        self.mode: Mode = 'all'
+        self.sample_rate = 1.0
+        self.max_size_kb = 0
+        self._reporter = None
+        self._report_dir: Path | None = None
+        self._pending: list[tuple[ExecutableItem, str, AttachmentType, Body]] = []
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        listener = config.pluginmanager.get_plugin("allure_listener")
+        report_dir = config.option.allure_report_dir
+        self._reporter = listener.allure_logger if listener and report_dir else None
+        self._report_dir = Path(report_dir) if report_dir else None
+        self.mode = config.getini('allure_attachments')
+        self.sample_rate = float(config.getini('allure_attachments_sample_rate'))
+        self.max_size_kb = int(config.getini('allure_attachments_max_kb'))
+        if self.mode not in ('all', 'failed', 'sampled'):
+            raise ValueError(f'Неизвестный режим allure_attachments: {self.mode}')
+
+    @property
+    def enabled(self) -> bool:
+        return self._reporter is not None
+
+    def attach(self, body: Body, name: str, attachment_type: AttachmentType):
+        """Прикрепить вложение к текущему шагу allure с учетом политики"""
+        if not self.enabled:
+            return
+        item = self._reporter.get_last_item(ExecutableItem)
+        if item is not None:
+            self._add(item, name, attachment_type, body)
+
+    def attach_when_done(self, future, body: Callable[[object], Body], name: str, attachment_type: AttachmentType):
+        """Прикрепить к текущему шагу вложение по готовому future, не дожидаясь его.
+        Шаг запоминается сейчас, body(future) вызывается из add_done_callback, в том числе из потока gRPC."""
+        if not self.enabled:
+            return
+        item = self._reporter.get_last_item(ExecutableItem)
+        if item is not None:
+            future.add_done_callback(lambda done: self._add(item, name, attachment_type, lambda: body(done)))
+
+    def _add(self, item: ExecutableItem, name: str, attachment_type: AttachmentType, body: Body):
+        if self.mode == 'all':
+            self._write(item, name, attachment_type, body)
+        else:
+            with self._lock:
+                self._pending.append((item, name, attachment_type, body))
+
+    def on_report(self, report):
+        """Вызывается на каждый отчет фазы теста, после teardown решает судьбу накопленных вложений"""
+        if report.failed:
+            self._failed = True
+        if report.when != 'teardown':
+            return
+        with self._lock:
+            pending, self._pending = self._pending, []
+            failed, self._failed = self._failed, False
+        keep = failed or (self.mode == 'sampled' and random.random() < self.sample_rate)
+        if keep:
+            for item, name, attachment_type, body in pending:
+                self._write(item, name, attachment_type, body)
+
+    def _write(self, item: ExecutableItem, name: str, attachment_type: AttachmentType, body: Body):
+        file_name = ATTACHMENT_PATTERN.format(prefix=uuid.uuid4(), ext=attachment_type.extension)
+        try:
+            self._stream_to_file(self._report_dir / file_name, body)
+        except Exception as e:
+            logging.warning(f'Не удалось записать вложение {name}: {e}')
+            return
+        item.attachments.append(Attachment(name=name, source=file_name, type=attachment_type.mime_type))
+
+    def _stream_to_file(self, path: Path, body: Body):
+        if callable(body):
+            body = body()
+        chunks = [body] if isinstance(body, (str, bytes)) else body
+        limit = self.max_size_kb * 1024
+        written = 0
+        with open(path, 'wb') as file:
+            for chunk in chunks:
+                data = chunk.encode('utf8') if isinstance(chunk, str) else chunk
+                if limit and written + len(data) > limit:
+                    file.write(data[:limit - written])
+                    file.write(TRUNCATED_NOTE.format(limit=self.max_size_kb).encode('utf8'))
+                    return
+                file.write(data)
+                written += len(data)
+
+
+attachments = AttachmentPolicy()
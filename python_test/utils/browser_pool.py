@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from selenium import webdriver
+from selenium.common import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+DEFAULT_ARGS = ("--headless", "--incognito", "--disable-dev-shm-usage")
+STORAGE_TYPES = "local_storage,session_storage,indexeddb,websql,service_workers,cache_storage"
+
+
+def chrome_options(*extra_args: str) -> Options:
+    options = Options()
+    for arg in (*extra_args, *DEFAULT_ARGS):
+        options.add_argument(arg)
+    return options
+
+
+class BrowserPool:
+    """Пул запущенных Chrome на воркер.
+
+    Браузер выдается тесту с чистым состоянием: cookies и хранилища origin-ов приложения очищаются через CDP,
+    лишние вкладки закрываются. После max_uses выдач или при падении браузер перезапускается.
+    Браузеры с разными доп. аргументами (например --lang=en) хранятся в пуле раздельно.
+    """
+
+    def __init__(self, origins: list[str], size: int = 1, max_uses: int = 20):
+        self.origins = [origin.rstrip('/') for origin in origins if origin]
+        self.size = size
+        self.max_uses = max_uses
+        self._idle: dict[tuple[str, ...], list[WebDriver]] = {}
+        self._uses: dict[WebDriver, int] = {}
+        self._args: dict[WebDriver, tuple[str, ...]] = {}
+        self._warming: list[Future] = []
+        self._executor = ThreadPoolExecutor(max_workers=max(size, 1), thread_name_prefix='browser-pool')
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.recycled = self.crashed = 0
+        self.startup_times: list[float] = []
+
+    def _start(self, args: tuple[str, ...]) -> WebDriver:
+        started = time.perf_counter()
+        driver = webdriver.Chrome(options=chrome_options(*args))
+        self.startup_times.append(time.perf_counter() - started)
+        self._uses[driver] = 0
+        self._args[driver] = args
+        return driver
+
+    def prewarm(self, args: tuple[str, ...] = ()):
+        """Запустить в фоне size браузеров, выдача не ждет запуска всех"""
+
+        def start_idle():
+            driver = self._start(args)
+            with self._lock:
+                self._idle.setdefault(args, []).append(driver)
+
+        self._warming = [self._executor.submit(start_idle) for _ in range(self.size)]
+
+    def _take_idle(self, args: tuple[str, ...]) -> WebDriver | None:
+        with self._lock:
+            idle = self._idle.get(args)
+            return idle.pop() if idle else None
+
+    def acquire(self, *args: str) -> WebDriver:
+        driver = self._take_idle(args)
+        if driver is None and args == () and any(not f.done() for f in self._warming):
+            next(f for f in self._warming if not f.done()).exception()
+            driver = self._take_idle(args)
+        if driver is not None and self._is_alive(driver):
+            self.hits += 1
+        else:
+            if driver is not None:
+                self.crashed += 1
+                self._quit(driver)
+            self.misses += 1
+            driver = self._start(args)
+        self._uses[driver] += 1
+        return driver
+
+    def release(self, driver: WebDriver):
+        if self._uses.get(driver, 0) >= self.max_uses:
+            self.recycled += 1
+            self._quit(driver)
+            return
+        try:
+            self.reset(driver)
+        except WebDriverException as e:
+            logging.warning(f'Браузер не удалось очистить, перезапуск: {e}')
+            self.crashed += 1
+            self._quit(driver)
+            return
+        with self._lock:
+            self._idle.setdefault(self._args[driver], []).append(driver)
+
+    def reset(self, driver: WebDriver):
+        """Очистить cookies и хранилища приложения, оставить одну пустую вкладку"""
+        for handle in driver.window_handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(driver.window_handles[0])
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        for origin in self.origins:
+            driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': STORAGE_TYPES})
+        driver.get('about:blank')
+
+    @staticmethod
+    def _is_alive(driver: WebDriver) -> bool:
+        try:
+            # любой запрос к драйверу: у упавшего браузера он завершится WebDriverException
+            driver.execute_script('return 1')
+            return True
+        except WebDriverException:
+            return False
+
+    def _quit(self, driver: WebDriver):
+        self._uses.pop(driver, None)
+        self._args.pop(driver, None)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def close(self):
+        for future in self._warming:
+            future.exception()
+        self._executor.shutdown()
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for drivers in idle.values():
+            for driver in drivers:
+                self._quit(driver)
+
+    def report(self) -> dict[str, float]:
+        acquired = self.hits + self.misses
+        avg_startup = sum(self.startup_times) / len(self.startup_times) if self.startup_times else 0.0
+        return {
+            'acquired': acquired,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / acquired, 3) if acquired else 0.0,
+            'recycled': self.recycled,
+            'crashed': self.crashed,
+            'started': len(self.startup_times),
+            'avg_startup_s': round(avg_startup, 2),
+            'startup_saved_s': round(self.hits * avg_startup, 2),
+        }
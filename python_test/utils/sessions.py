@@ -1,9 +1,21 @@
+import json
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
 from urllib.parse import parse_qs, urlparse
 
+import allure
+import httpx
 import requests
-from requests import Session
+from allure_commons.types import AttachmentType
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
 
-from python_test.utils.allure_helpers import allure_attach_request, allure_request_logger
+from python_test.utils.allure_helpers import allure_attach_async_request, allure_attach_request, allure_request_logger
+from python_test.utils.attachments import attachments
+from python_test.utils.stats import LatencyReservoir
+from python_test.utils.timings import call_timings, soap_operation
 
 
 def raise_for_status(function):
@@ -20,6 +32,20 @@ def raise_for_status(function):
     return wrapper
 
 
+def async_raise_for_status(function):
+    async def wrapper(*args, **kwargs):
+        response = await function(*args, **kwargs)
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            if response.status_code == 400:
+                e.add_note(response.text)
+                raise
+        return response
+
+    return wrapper
+
+
 class BaseSession(Session):
     """Сессия с передачей base_url и логированием запроса, ответа, хедеров ответа."""
 
@@ -34,6 +60,43 @@ class BaseSession(Session):
         return super().request(method, self.base_url + url, **kwargs)
 
 
+class PlainSession(Session):
+    """Сессия с base_url и пулом keep-alive соединений без allure вложений и логирования.
+    Для нагрузки: отрисовка запроса и логирование не должны входить в замеренную задержку.
+    Любой ответ 4xx/5xx (в том числе SOAP fault с HTTP 500) поднимает HTTPError, чтобы нагрузка считала его ошибкой."""
+
+    def __init__(self, base_url: str = '', pool_size: int = 10):
+        super().__init__()
+        self.base_url = base_url
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        response = super().request(method, self.base_url + url, **kwargs)
+        response.raise_for_status()
+        return response
+
+
+class AsyncBaseSession(httpx.AsyncClient):
+    """Асинхронная сессия с передачей base_url и логированием запроса, ответа, хедеров ответа.
+    Соединения переиспользуются из пула keep-alive, размер пула задается max_connections."""
+
+    def __init__(self, *args, **kwargs):
+        max_connections = kwargs.pop("max_connections", 100)
+        super().__init__(
+            base_url=kwargs.pop("base_url", ""),
+            timeout=kwargs.pop("timeout", 30),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    @async_raise_for_status
+    @allure_attach_async_request
+    async def request(self, method, url, **kwargs):
+        """Логирование запроса, base_url вклеивает httpx."""
+        return await super().request(method, url, **kwargs)
+
+
 class AuthSession(Session):
     """Сессия с передачей base_url и логированием запроса, ответа, хедеров ответа.
     + Авто сохранение cookies внутри сессии из каждого response и redirect response, и 'code'."""
@@ -62,15 +125,63 @@ class AuthSession(Session):
 
 
 class SoapSession(Session):
-    """Сессия с передачей base_url и логированием запроса, ответа, хедеров ответа."""
+    """Сессия с передачей base_url и логированием запроса, ответа, хедеров ответа.
+    Соединения переиспользуются из пула keep-alive размера pool_size, send_many отправляет конверты конкурентно.
+    Задержки копятся по SOAP операциям в ограниченной выборке, сводка с гистограммой - latency_report,
+    сброс - reset_latencies."""
 
     def __init__(self, *args, **kwargs):
         super().__init__()
         self.base_url = kwargs.pop("base_url", "")
+        self.pool_size = kwargs.pop("pool_size", 10)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
         self.headers.update({'Content-Type': 'text/xml;charset=UTF-8'})
+        self.latencies: dict[str, LatencyReservoir] = defaultdict(LatencyReservoir)
+        self._latencies_lock = threading.Lock()
 
     @raise_for_status
     @allure_request_logger
     def request(self, method='POST', url='', **kwargs):
         """Логирование запроса, метод POST для всех"""
-        return super().request(method, self.base_url + url, **kwargs)
+        return self._send(method, url, **kwargs)
+
+    def _send(self, method='POST', url='', **kwargs) -> Response:
+        response = super().request(method, self.base_url + url, **kwargs)
+        operation = soap_operation(response.request.body)
+        elapsed = response.elapsed.total_seconds()
+        call_timings.record('soap', operation, elapsed)
+        with self._latencies_lock:
+            self.latencies[operation].add(elapsed)
+        return response
+
+    def send_many(self, envelopes: Iterable[str], concurrency: int | None = None,
+                  raise_on_error: bool = True) -> list[Response]:
+        """Отправить конверты конкурентно, одновременно не более concurrency (по умолчанию pool_size).
+        Ответы возвращаются в порядке конвертов. Запросы не логируются по одному, в allure пишется сводка задержек.
+        Если хоть один ответ не 2xx (SOAP fault приходит с HTTP 500), после отправки всех конвертов поднимается
+        HTTPError с числом ошибок и первым неуспешным ответом. raise_on_error=False - вернуть все ответы как есть."""
+        envelopes = list(envelopes)
+        with allure.step(f'Отправить {len(envelopes)} SOAP запросов'):
+            with ThreadPoolExecutor(max_workers=concurrency or self.pool_size) as executor:
+                responses = list(executor.map(lambda envelope: self._send(data=envelope), envelopes))
+            attachments.attach(lambda: json.dumps(self.latency_report(), indent=2), name='SOAP latency',
+                               attachment_type=AttachmentType.JSON)
+            failed = [index for index, response in enumerate(responses) if not response.ok]
+            if failed and raise_on_error:
+                first = responses[failed[0]]
+                error = requests.HTTPError(f'{len(failed)} из {len(responses)} SOAP запросов завершились ошибкой, '
+                                           f'первый - конверт #{failed[0]}: HTTP {first.status_code}', response=first)
+                error.add_note(first.text)
+                raise error
+        return responses
+
+    def latency_report(self) -> dict[str, dict]:
+        """Количество, перцентили и гистограмма задержек по каждой SOAP операции"""
+        with self._latencies_lock:
+            return {operation: reservoir.summary() for operation, reservoir in self.latencies.items()}
+
+    def reset_latencies(self):
+        with self._latencies_lock:
+            self.latencies.clear()
@@ -0,0 +1,72 @@
+import re
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Mapping
+from xml.sax.saxutils import escape
+
+XML_DIR = Path(__file__).parent.parent / 'resources' / 'templates' / 'xml'
+
+_PLACEHOLDER = re.compile(r'{{\s*(\w+)\s*}}')
+_ENTITIES = {'"': '&quot;', "'": '&apos;'}
+
+
+def escape_value(value: Any) -> str:
+    """Значение для подстановки в XML: None - пустая строка, спецсимволы XML экранируются"""
+    if value is None:
+        return ''
+    return escape(value if isinstance(value, str) else str(value), _ENTITIES)
+
+
+class EnvelopeBuilder:
+    """SOAP конверт, скомпилированный из xml шаблона с подстановками {{ name }} в строку str.format.
+    Рендер - экранирование значений и один format_map, без jinja на каждый вызов."""
+
+    def __init__(self, source: str):
+        # split чередует текст шаблона и имена подстановок, фигурные скобки в тексте экранируются для format
+        parts = _PLACEHOLDER.split(source.removesuffix('\n'))
+        self.fields: tuple[str, ...] = tuple(dict.fromkeys(parts[1::2]))
+        self._format = ''.join(part.replace('{', '{{').replace('}', '}}') if i % 2 == 0 else '{' + part + '}'
+                               for i, part in enumerate(parts))
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        return self._format.format_map({field: escape_value(values.get(field)) for field in self.fields})
+
+    def render_many(self, rows: Iterable[Mapping[str, Any]]) -> Iterator[str]:
+        """Конверты для пачки значений, лениво, например для нагрузочного прогона"""
+        render = self.render
+        return (render(values) for values in rows)
+
+
+class EnvelopeRegistry:
+    """Общий на процесс реестр конвертов из resources/templates/xml, путь не зависит от рабочего каталога.
+    Каждый шаблон читается и компилируется один раз."""
+
+    def __init__(self, directory: Path = XML_DIR):
+        self.directory = directory
+        self._builders: dict[str, EnvelopeBuilder] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> EnvelopeBuilder:
+        builder = self._builders.get(name)
+        if builder is None:
+            with self._lock:
+                builder = self._builders.get(name)
+                if builder is None:
+                    source = (self.directory / f'{name}.xml').read_text(encoding='utf8')
+                    builder = self._builders[name] = EnvelopeBuilder(source)
+        return builder
+
+    def render(self, name: str, values: Mapping[str, Any]) -> str:
+        return self.get(name).render(values)
+
+    def render_many(self, name: str, rows: Iterable[Mapping[str, Any]]) -> Iterator[str]:
+        return self.get(name).render_many(rows)
+
+    def precompile(self) -> list[str]:
+        names = sorted(path.stem for path in self.directory.glob('*.xml'))
+        for name in names:
+            self.get(name)
+        return names
+
+
+envelopes = EnvelopeRegistry()
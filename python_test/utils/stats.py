@@ -0,0 +1,72 @@
+import bisect
+import math
+import random
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Перцентиль методом nearest-rank по отсортированному списку"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def latency_summary_ms(latencies: list[float]) -> dict[str, float]:
+    """p50/p95/p99/max в миллисекундах по списку задержек в секундах"""
+    values = sorted(latencies)
+    return {
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+# Верхние границы корзин гистограммы задержек, мс
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def _histogram_labels(bounds_ms: tuple[int, ...]) -> list[str]:
+    return [f'<={bound}ms' for bound in bounds_ms] + [f'>{bounds_ms[-1]}ms']
+
+
+def latency_histogram(latencies: list[float], bounds_ms: tuple[int, ...] = HISTOGRAM_BOUNDS_MS) -> dict[str, int]:
+    """Количество задержек по корзинам "<=N ms", последняя корзина - больше максимальной границы"""
+    counts = [0] * (len(bounds_ms) + 1)
+    for latency in latencies:
+        counts[bisect.bisect_left(bounds_ms, latency * 1000)] += 1
+    return {label: count for label, count in zip(_histogram_labels(bounds_ms), counts, strict=True) if count}
+
+
+class LatencyReservoir:
+    """Задержки одной операции в ограниченной памяти для долгих сессий.
+    count, max и гистограмма точные, перцентили - по равномерной выборке не более size значений (алгоритм R)."""
+
+    def __init__(self, size: int = 10_000, bounds_ms: tuple[int, ...] = HISTOGRAM_BOUNDS_MS):
+        self.size = size
+        self.bounds_ms = bounds_ms
+        self.count = 0
+        self.max = 0.0
+        self.sample: list[float] = []
+        self.buckets = [0] * (len(bounds_ms) + 1)
+        self._random = random.Random()
+
+    def add(self, latency: float):
+        self.count += 1
+        self.max = max(self.max, latency)
+        self.buckets[bisect.bisect_left(self.bounds_ms, latency * 1000)] += 1
+        if len(self.sample) < self.size:
+            self.sample.append(latency)
+        elif (index := self._random.randrange(self.count)) < self.size:
+            self.sample[index] = latency
+
+    def summary(self) -> dict:
+        """count, p50/p95/p99/max в миллисекундах и гистограмма"""
+        return {
+            'count': self.count,
+            **latency_summary_ms(self.sample),
+            'max_ms': round(self.max * 1000, 2),
+            'histogram': {label: count
+                          for label, count in zip(_histogram_labels(self.bounds_ms), self.buckets, strict=True)
+                          if count},
+        }
@@ -0,0 +1,44 @@
+import threading
+
+from jinja2 import Environment, PackageLoader, Template, select_autoescape
+
+
+class TemplateRegistry:
+    """Общий на процесс реестр jinja шаблонов из resources/templates.
+    Environment создается при первом обращении, каждый шаблон компилируется один раз."""
+
+    def __init__(self, package: str = "resources"):
+        self._package = package
+        self._env = None
+        self._templates: dict[str, Template] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def env(self) -> Environment:
+        if self._env is None:
+            with self._lock:
+                if self._env is None:
+                    self._env = Environment(
+                        loader=PackageLoader(self._package),
+                        autoescape=select_autoescape()
+                    )
+        return self._env
+
+    def get(self, name: str) -> Template:
+        template = self._templates.get(name)
+        if template is None:
+            template = self._templates.setdefault(name, self.env.get_template(name))
+        return template
+
+    def render(self, name: str, **context) -> str:
+        return self.get(name).render(context)
+
+    def precompile(self, extensions: tuple[str, ...] = ('ftl', 'html')) -> list[str]:
+        """Скомпилировать заранее все шаблоны с указанными расширениями"""
+        names = self.env.list_templates(extensions=extensions)
+        for name in names:
+            self.get(name)
+        return names
+
+
+templates = TemplateRegistry()
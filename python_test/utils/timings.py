@@ -0,0 +1,46 @@
+import re
+import threading
+
+# Идентификаторы в пути запроса заменяются на {id}, чтобы вызовы одного метода API попадали в одну строку
+_ID_SEGMENT = re.compile(r'/(?:[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}|\d+)(?=/|$)')
+_SOAP_OPERATION = re.compile(rb'<(?:\w+:)?(\w+Request)\b')
+
+
+def normalize_path(url: str) -> str:
+    return _ID_SEGMENT.sub('/{id}', url.split('?', 1)[0])
+
+
+def soap_operation(body: bytes | str | None) -> str:
+    if isinstance(body, str):
+        body = body.encode('utf8')
+    match = _SOAP_OPERATION.search(body or b'')
+    return match.group(1).decode('utf8') if match else 'unknown'
+
+
+class CallTimings:
+    """Длительности внешних вызовов (HTTP, SOAP, gRPC, SQL), агрегированные по тесту и цели вызова"""
+
+    def __init__(self):
+        self.current: str = ''
+        self.calls: dict[tuple[str, str, str], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, target: str, seconds: float):
+        key = (self.current, kind, target)
+        with self._lock:
+            stats = self.calls.get(key)
+            if stats is None:
+                self.calls[key] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    def drain(self) -> list[tuple[str, str, str, int, float, float]]:
+        """Забрать накопленные агрегаты: nodeid, вид, цель, количество, суммарное и максимальное время"""
+        with self._lock:
+            calls, self.calls = self.calls, {}
+        return [(*key, int(count), total, maximum) for key, (count, total, maximum) in calls.items()]
+
+
+call_timings = CallTimings()
@@ -1,32 +1,202 @@
-import datetime
+import asyncio
+import contextlib
+import contextvars
+import inspect
+import json
 import logging
+import random
+import threading
 import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator
 
 import allure
 
+from python_test.utils.allure_helpers import in_async_step
+from python_test.utils.stats import latency_summary_ms
+
+# Стратегия пауз между попытками: номер попытки (с 1) -> пауза в секундах
+Backoff = Callable[[int], float]
+
+
+def fixed(interval: float = 0.1) -> Backoff:
+    return lambda attempt: interval
+
+
+def exponential(initial: float = 0.1, factor: float = 2, max_delay: float = 2.0) -> Backoff:
+    return lambda attempt: min(initial * factor ** (attempt - 1), max_delay)
+
+
+def jittered(initial: float = 0.1, factor: float = 2, max_delay: float = 2.0) -> Backoff:
+    """Экспоненциальная пауза со случайным разбросом, чтобы параллельные воркеры не опрашивали сервис синхронно"""
+    base = exponential(initial, factor, max_delay)
+    return lambda attempt: random.uniform(base(attempt) / 2, base(attempt))
+
+
+def is_present(result) -> bool:
+    return result is not None and result != [] and result != ''
+
+
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar('wait_deadline', default=None)
+
+
+@contextlib.contextmanager
+def deadline(timeout: float) -> Iterator[float]:
+    """Ограничить суммарное время всех ожиданий внутри блока, вложенные ожидания не выходят за общий дедлайн"""
+    value = _effective_deadline(timeout)
+    token = _deadline.set(value)
+    try:
+        yield value
+    finally:
+        _deadline.reset(token)
+
+
+def _effective_deadline(timeout: float) -> float:
+    own = time.monotonic() + timeout
+    outer = _deadline.get()
+    return own if outer is None else min(own, outer)
+
+
+@dataclass
+class WaitResult:
+    name: str
+    attempts: int
+    elapsed: float
+    success: bool
+
+
+class WaitStats:
+    """Статистика ожиданий за сессию в разрезе имени ожидания"""
+
+    def __init__(self):
+        self.results: list[WaitResult] = []
+        self._lock = threading.Lock()
+
+    def add(self, result: WaitResult):
+        with self._lock:
+            self.results.append(result)
+
+    def report(self) -> list[dict[str, Any]]:
+        by_name: dict[str, list[WaitResult]] = {}
+        for result in self.results:
+            by_name.setdefault(result.name, []).append(result)
+        rows = []
+        for name, results in by_name.items():
+            rows.append({
+                'name': name,
+                'calls': len(results),
+                'timeouts': sum(not r.success for r in results),
+                'attempts_total': sum(r.attempts for r in results),
+                'attempts_max': max(r.attempts for r in results),
+                'total_s': round(sum(r.elapsed for r in results), 3),
+                **latency_summary_ms([r.elapsed for r in results if r.success]),
+            })
+        return sorted(rows, key=lambda row: row['total_s'], reverse=True)
+
+    def log_summary(self, top: int = 10):
+        rows = self.report()
+        if not rows:
+            return
+        lines = [f"{row['name']}: {row['calls']} вызовов, {row['total_s']}s, попыток max {row['attempts_max']}, "
+                 f"p95 {row['p95_ms']} ms, таймаутов {row['timeouts']}" for row in rows[:top]]
+        logging.info('Ожидания, больше всего времени:\n' + '\n'.join(lines))
+
+    def dump(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), indent=4, ensure_ascii=False), encoding='utf8')
+
+
+wait_stats = WaitStats()
+
+
+def _finish(name: str, attempts: int, started: float, success: bool, timeout: float, raise_on_timeout: bool,
+            last_error: Exception | None):
+    elapsed = time.monotonic() - started
+    wait_stats.add(WaitResult(name, attempts, elapsed, success))
+    if success:
+        return
+    message = f'Результаты {name} не найдены за {timeout}s, попыток {attempts}'
+    if raise_on_timeout:
+        raise TimeoutError(message) from last_error
+    logging.error(message)
+
+
+def wait_for(function: Callable, *args, timeout: float = 12, backoff: Backoff | None = None,
+             condition: Callable[[Any], bool] = is_present, ignored: tuple[type[Exception], ...] = (),
+             raise_on_timeout: bool = False, name: str | None = None, **kwargs):
+    """Вызывать function, пока результат не удовлетворит condition или не истечет таймаут.
+    Исключения из ignored считаются неуспешной попыткой. Таймаут не выходит за дедлайн внешнего блока deadline.
+    backoff по умолчанию - fixed(). Вернуть последний результат (None при исключении на последней попытке)."""
+    name = name or function.__name__
+    backoff = backoff or fixed()
+    with allure.step(f'Ожидание {name}'):
+        started = time.monotonic()
+        end = _effective_deadline(timeout)
+        attempts = 0
+        result = last_error = None
+        while True:
+            attempts += 1
+            try:
+                result = function(*args, **kwargs)
+                last_error = None
+            except ignored as e:
+                result, last_error = None, e
+            if last_error is None and condition(result):
+                _finish(name, attempts, started, True, timeout, raise_on_timeout, None)
+                return result
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                _finish(name, attempts, started, False, timeout, raise_on_timeout, last_error)
+                return result
+            time.sleep(min(backoff(attempts), remaining))
+
+
+async def async_wait_for(function: Callable, *args, timeout: float = 12, backoff: Backoff | None = None,
+                         condition: Callable[[Any], bool] = is_present, ignored: tuple[type[Exception], ...] = (),
+                         raise_on_timeout: bool = False, name: str | None = None, **kwargs):
+    """Асинхронный аналог wait_for, function может быть корутинной функцией.
+    Шаг allure записывается после ожидания, чтобы параллельные ожидания не вкладывались друг в друга."""
+    name = name or function.__name__
+    return await in_async_step(f'Ожидание {name}', _poll(function, args, kwargs, timeout, backoff or fixed(),
+                                                        condition, ignored, raise_on_timeout, name))
+
+
+async def _poll(function: Callable, args: tuple, kwargs: dict, timeout: float, backoff: Backoff,
+                condition: Callable[[Any], bool], ignored: tuple[type[Exception], ...], raise_on_timeout: bool,
+                name: str):
+    started = time.monotonic()
+    end = _effective_deadline(timeout)
+    attempts = 0
+    result = last_error = None
+    while True:
+        attempts += 1
+        try:
+            result = function(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            last_error = None
+        except ignored as e:
+            result, last_error = None, e
+        if last_error is None and condition(result):
+            _finish(name, attempts, started, True, timeout, raise_on_timeout, None)
+            return result
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            _finish(name, attempts, started, False, timeout, raise_on_timeout, last_error)
+            return result
+        await asyncio.sleep(min(backoff(attempts), remaining))
+
 
-@allure.step
 def wait_until_timeout(function):
+    """Декоратор ожидания непустого результата функции.
+    Параметры вызова: timeout (12s), polling_interval (0.1s), err - бросить TimeoutError по таймауту."""
+
     def wrapper(*args, **kwargs):
-        default_timeout = 12
-        timeout = kwargs.pop("timeout", default_timeout)
+        timeout = kwargs.pop("timeout", 12)
         polling_interval = kwargs.pop("polling_interval", 0.1)
         err = kwargs.pop("err", None)
-        start_time = datetime.datetime.now().timestamp()
-        result = None
-        logging.debug(f'{start_time} start waiting')
-        while datetime.datetime.now().timestamp() < start_time + timeout + 0.1:
-            result = function(*args, **kwargs)
-            if result is not None and result != [] and result != '':
-                break
-            time.sleep(polling_interval)
-        if err and result is None:
-            raise TimeoutError(
-                f"{datetime.datetime.now().isoformat()} "
-                f"Результаты функции {function.__name__} не найдены за {timeout}s"
-            )
-        if result is None:
-            logging.error(f"{datetime.datetime.now().timestamp()} result is None")
-        return result
+        return wait_for(function, *args, timeout=timeout, backoff=fixed(polling_interval),
+                        raise_on_timeout=bool(err), **kwargs)
 
     return wrapper
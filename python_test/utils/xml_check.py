@@ -1,11 +1,156 @@
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Iterable, Iterator
 from xml.etree import ElementTree
 
+from python_test.model.soap import SoapUser, UsersPage
+
 namespaces = {
     'soap': 'http://schemas.xmlsoap.org/soap/envelope/',
     'ns2': 'niffler-userdata'
 }
 
+CHUNK_SIZE = 64 * 1024
+
+
+def _tag(name: str, namespace: str = namespaces['ns2']) -> str:
+    return f'{{{namespace}}}{name}'
+
+
+# Теги полей ответа сопоставлены с полями моделей один раз, при разборе нужен только поиск в словаре
+USER_FIELDS = {
+    _tag('id'): 'id',
+    _tag('username'): 'username',
+    _tag('firstname'): 'firstname',
+    _tag('surname'): 'surname',
+    _tag('fullname'): 'fullname',
+    _tag('currency'): 'currency',
+    _tag('photo'): 'photo',
+    _tag('photoSmall'): 'photo_small',
+    _tag('friendshipStatus'): 'friendship_status',
+}
+PAGE_FIELDS = {
+    _tag('size'): 'size',
+    _tag('number'): 'number',
+    _tag('totalElements'): 'total_elements',
+    _tag('totalPages'): 'total_pages',
+}
+FAULT = _tag('Fault', namespaces['soap'])
+
+Source = str | bytes | Iterable[bytes]
+
+
+class SoapFault(Exception):
+
+    def __init__(self, code: str | None, message: str | None):
+        super().__init__(f'{code}: {message}')
+        self.code = code
+        self.message = message
+
+
+def _chunks(source, chunk_size: int = CHUNK_SIZE) -> Iterable[bytes]:
+    """Тело ответа кусками: строка, байты, requests.Response, файл или итератор байтов"""
+    if isinstance(source, str):
+        source = source.encode('utf8')
+    if isinstance(source, bytes):
+        return (source[i:i + chunk_size] for i in range(0, len(source), chunk_size))
+    if hasattr(source, 'iter_content'):
+        return source.iter_content(chunk_size)
+    if hasattr(source, 'read'):
+        return iter(lambda: source.read(chunk_size), b'')
+    return source
+
+
+class ResponseExtractor:
+    """Потоковый разбор ответа операции niffler-userdata через XMLPullParser.
+
+    Разобранные элементы user сразу удаляются из дерева, поэтому память не растет с числом пользователей.
+    many=False - ответ userResponse с одним пользователем, many=True - usersResponse со списком.
+    """
+
+    def __init__(self, response: str, many: bool):
+        self.response_tag = _tag(response)
+        self.record_tag = _tag('user')
+        self.many = many
+
+    def _events(self, source: Source) -> Iterator[tuple[str, object]]:
+        parser = ElementTree.XMLPullParser(events=('start', 'end'))
+        container = record = None
+        for chunk in _chunks(source):
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                tag = element.tag
+                if event == 'start':
+                    if tag == self.record_tag:
+                        record = {}
+                    elif tag == self.response_tag:
+                        container = element
+                elif record is not None:
+                    if tag == self.record_tag:
+                        yield 'user', SoapUser(**record)
+                        record = None
+                        (element if container is None else container).clear()
+                    elif field := USER_FIELDS.get(tag):
+                        record[field] = element.text
+                elif field := PAGE_FIELDS.get(tag):
+                    yield field, element.text
+                elif tag == FAULT:
+                    raise SoapFault(element.findtext('faultcode'), element.findtext('faultstring'))
+        parser.close()
+
+    def iter_users(self, source: Source) -> Iterator[SoapUser]:
+        for kind, value in self._events(source):
+            if kind == 'user':
+                yield value
+
+    def decode(self, source: Source) -> SoapUser | UsersPage | None:
+        if not self.many:
+            return next(self.iter_users(source), None)
+        page = {'users': []}
+        for kind, value in self._events(source):
+            if kind == 'user':
+                page['users'].append(value)
+            else:
+                page[kind] = value
+        return UsersPage(**page)
+
+
+_user_response = ResponseExtractor('userResponse', many=False)
+_users_response = ResponseExtractor('usersResponse', many=True)
+
+EXTRACTORS: dict[str, ResponseExtractor] = {
+    'currentUser': _user_response,
+    'updateUser': _user_response,
+    'sendInvitation': _user_response,
+    'acceptInvitation': _user_response,
+    'declineInvitation': _user_response,
+    'friends': _users_response,
+    'friendsPage': _users_response,
+    'allUsers': _users_response,
+    'allUsersPage': _users_response,
+}
+
+
+def decode(operation: str, source: Source) -> SoapUser | UsersPage | None:
+    """Разобрать ответ операции (currentUser, friends, sendInvitation...) в модель"""
+    return EXTRACTORS[operation].decode(source)
+
+
+def decode_user(source: Source) -> SoapUser | None:
+    return _user_response.decode(source)
+
+
+def decode_users(source: Source) -> UsersPage:
+    return _users_response.decode(source)
+
+
+def iter_users(source: Source) -> Iterator[SoapUser]:
+    """Пользователи из usersResponse по одному, без накопления списка"""
+    return _users_response.iter_users(source)
+
 
+# DOM разбор всего ответа, оставлен для сравнения в benchmark
 def safe_find_text(element, path, namespaces=None, default=None):
     elem = element.find(path, namespaces)
     return elem.text if elem is not None else default
@@ -33,3 +178,51 @@ def get_friends_list(xml_str: str):
         'currency': safe_find_text(user, 'ns2:currency', namespaces),
         'friendshipStatus': safe_find_text(user, 'ns2:friendshipStatus', namespaces)
     } for user in users]
+
+
+def users_response_xml(count: int) -> bytes:
+    """Ответ friends с count друзьями в формате niffler-userdata"""
+    users = ''.join(
+        f'<ns2:user><ns2:id>{i:08d}-0000-0000-0000-000000000000</ns2:id><ns2:username>friend_{i}</ns2:username>'
+        f'<ns2:fullname>Friend Number {i}</ns2:fullname><ns2:currency>RUB</ns2:currency>'
+        f'<ns2:friendshipStatus>FRIEND</ns2:friendshipStatus></ns2:user>'
+        for i in range(count)
+    )
+    return (f'<SOAP-ENV:Envelope xmlns:SOAP-ENV="{namespaces["soap"]}"><SOAP-ENV:Header/><SOAP-ENV:Body>'
+            f'<ns2:usersResponse xmlns:ns2="{namespaces["ns2"]}">{users}</ns2:usersResponse>'
+            f'</SOAP-ENV:Body></SOAP-ENV:Envelope>').encode('utf8')
+
+
+def _measure(function: Callable[[], object]) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'time_ms': round(elapsed * 1000, 1), 'peak_kb': round(peak / 1024)}
+
+
+def benchmark(count: int) -> dict[str, dict]:
+    """Время и пиковая память разбора ответа friends с count друзьями: DOM против потокового разбора.
+    Тело ответа создается заранее и в замер не входит, как и у полученного по сети ответа."""
+    body = users_response_xml(count)
+    text = body.decode('utf8')
+    return {
+        'dom': _measure(lambda: get_friends_list(text)),
+        'stream_models': _measure(lambda: decode_users(body)),
+        'stream_iter': _measure(lambda: sum(1 for _ in iter_users(body))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение DOM и потокового разбора SOAP ответа friends')
+    parser.add_argument('--users', type=int, nargs='+', default=[100, 1000, 10000], help='Количество друзей в ответе')
+    args = parser.parse_args()
+    for count in args.users:
+        for name, result in benchmark(count).items():
+            print(f'{count:>7} {name:<14} {result["time_ms"]:>9} ms {result["peak_kb"]:>9} KB')
+
+
+if __name__ == '__main__':
+    main()